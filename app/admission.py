@@ -0,0 +1,186 @@
+"""Admission control: bounded concurrency and wait queues per route class.
+
+Reads and order writes each get a limit on requests in progress and on
+requests waiting for a slot. A request that finds the queue full, or waits
+longer than ADMISSION_MAX_QUEUE_WAIT_MS, is answered at once with 503 and
+Retry-After instead of piling up behind the MongoDB pool until the driver
+times out.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app import config, metrics
+
+# Rejection reasons, as returned by ConcurrencyLimiter.acquire
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class ConcurrencyLimiter:
+    """At most ``max_concurrency`` holders, with a FIFO queue of at most ``max_queue`` waiters"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._admitted = 0
+        self._queued = 0
+        self._max_queue_depth = 0
+        self._rejected = {QUEUE_FULL: 0, QUEUE_TIMEOUT: 0}
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot, waiting in the queue if needed; returns None or the rejection reason"""
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            self._admitted += 1
+            return None
+
+        if len(self._waiters) >= self.max_queue:
+            self._rejected[QUEUE_FULL] += 1
+            return QUEUE_FULL
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued += 1
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiters))
+        start = time.perf_counter()
+        try:
+            # release() hands its slot straight to the waiter it wakes
+            await asyncio.wait_for(waiter, self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Python 3.12+ can time out after release() already handed
+                # this waiter a slot; give it back rather than leak it
+                self.release()
+            self._rejected[QUEUE_TIMEOUT] += 1
+            return QUEUE_TIMEOUT
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            waited = time.perf_counter() - start
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        self._admitted += 1
+        return None
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "admitted": self._admitted,
+            "queued_total": self._queued,
+            "max_queue_depth": self._max_queue_depth,
+            "rejected_queue_full": self._rejected[QUEUE_FULL],
+            "rejected_queue_timeout": self._rejected[QUEUE_TIMEOUT],
+            "avg_queue_wait_ms": self._total_wait / self._queued * 1000 if self._queued else 0.0,
+            "max_queue_wait_ms": self._max_wait * 1000,
+        }
+
+
+# Limiters by (event loop, route class): futures belong to one loop, like the database clients
+_limiters: Dict[tuple, ConcurrencyLimiter] = {}
+
+
+def _route_class(scope) -> Optional[str]:
+    """The limiter a request goes through, or None for routes that are not limited"""
+    path = scope["path"]
+    if scope["method"] == "POST" and path.rstrip("/") == "/orders":
+        return "order_writes"
+    if scope["method"] == "GET" and (path.startswith("/products") or path.startswith("/orders")):
+        return "reads"
+    return None
+
+
+def _get_limiter(route_class: str) -> ConcurrencyLimiter:
+    key = (id(asyncio.get_running_loop()), route_class)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        if route_class == "order_writes":
+            max_concurrency, max_queue = config.ADMISSION_WRITE_MAX_CONCURRENCY, config.ADMISSION_WRITE_MAX_QUEUE
+        else:
+            max_concurrency, max_queue = config.ADMISSION_READ_MAX_CONCURRENCY, config.ADMISSION_READ_MAX_QUEUE
+        limiter = _limiters[key] = ConcurrencyLimiter(
+            max_concurrency, max_queue, config.ADMISSION_MAX_QUEUE_WAIT_MS / 1000
+        )
+    return limiter
+
+
+def get_admission_stats() -> Dict[str, Dict[str, Any]]:
+    """Limiter counters by route class, summed over event loops"""
+    totals: Dict[str, Dict[str, Any]] = {}
+    for (_, route_class), limiter in list(_limiters.items()):
+        stats = limiter.stats()
+        merged = totals.setdefault(route_class, dict.fromkeys(stats, 0))
+        for key, value in stats.items():
+            if key.startswith("max_"):
+                merged[key] = max(merged[key], value)
+            elif key != "avg_queue_wait_ms":
+                merged[key] += value
+        # Weighted by how many requests waited in each loop
+        merged["avg_queue_wait_ms"] += stats["avg_queue_wait_ms"] * stats["queued_total"]
+    for merged in totals.values():
+        merged["avg_queue_wait_ms"] = merged["avg_queue_wait_ms"] / merged["queued_total"] if merged["queued_total"] else 0.0
+    return totals
+
+
+metrics.registry.add_stats(
+    "admission",
+    "Admission control queue depth and rejections",
+    get_admission_stats,
+    label_name="route_class"
+)
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that sheds reads and order writes beyond the configured limits"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route_class = _route_class(scope) if scope["type"] == "http" and config.ADMISSION_CONTROL else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = _get_limiter(route_class)
+        if await limiter.acquire() is not None:
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send) -> None:
+        body = b'{"detail":"Server is busy, please retry"}'
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(config.ADMISSION_RETRY_AFTER_SECONDS).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,83 @@
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# Filtered list totals are cached briefly so repeated listings skip count_documents
+COUNT_CACHE_TTL_SECONDS = _env_float("COUNT_CACHE_TTL_SECONDS", 10.0)
+COUNT_CACHE_MAX_ENTRIES = _env_int("COUNT_CACHE_MAX_ENTRIES", 1024)
+
+# Read-through cache of products by ID (order pricing, get_product_by_id)
+PRODUCT_CACHE_TTL_SECONDS = _env_float("PRODUCT_CACHE_TTL_SECONDS", 60.0)
+PRODUCT_CACHE_MAX_ENTRIES = _env_int("PRODUCT_CACHE_MAX_ENTRIES", 10000)
+
+# Create the registered indexes (app/database/indexes.py) when the app starts
+ENSURE_INDEXES_ON_STARTUP = _env_bool("ENSURE_INDEXES_ON_STARTUP", False)
+
+# "serverless" keeps one single-connection client per event loop (Vercel);
+# "server" shares one pooled client per process (long-running uvicorn workers)
+MONGODB_CONNECTION_MODE = os.getenv("MONGODB_CONNECTION_MODE", "serverless").lower()
+MONGODB_MIN_POOL_SIZE = _env_int("MONGODB_MIN_POOL_SIZE", 5)
+MONGODB_MAX_POOL_SIZE = _env_int("MONGODB_MAX_POOL_SIZE", 50)
+
+# Group-commit concurrent order inserts into one insert_many
+ORDER_WRITE_BATCHING = _env_bool("ORDER_WRITE_BATCHING", False)
+ORDER_BATCH_MAX_DELAY_MS = _env_float("ORDER_BATCH_MAX_DELAY_MS", 5.0)
+ORDER_BATCH_MAX_SIZE = _env_int("ORDER_BATCH_MAX_SIZE", 100)
+
+# NDJSON bulk product import (POST /products/bulk)
+BULK_IMPORT_CHUNK_SIZE = _env_int("BULK_IMPORT_CHUNK_SIZE", 1000)
+BULK_IMPORT_MAX_ERRORS = _env_int("BULK_IMPORT_MAX_ERRORS", 1000)
+
+# Documents fetched per round trip by the NDJSON export endpoints
+EXPORT_BATCH_SIZE = _env_int("EXPORT_BATCH_SIZE", 1000)
+
+# Serialize list responses with orjson and skip re-validating them against
+# the response schemas (the schemas still document the endpoints)
+FAST_JSON_RESPONSES = _env_bool("FAST_JSON_RESPONSES", False)
+
+# Identical concurrent catalog reads share one in-flight MongoDB query
+COALESCE_PRODUCT_READS = _env_bool("COALESCE_PRODUCT_READS", True)
+
+# How GET /products?name= searches: "regex" (unindexed substring match),
+# "prefix" (indexed prefix match) or "ngram" (indexed substring match)
+PRODUCT_SEARCH_MODE = os.getenv("PRODUCT_SEARCH_MODE", "regex").lower()
+
+# GET /products/ response bodies are cached and answered with 304 for
+# matching If-None-Match; the TTL also bounds staleness from other workers
+RESPONSE_CACHE_TTL_SECONDS = _env_float("RESPONSE_CACHE_TTL_SECONDS", 10.0)
+RESPONSE_CACHE_MAX_ENTRIES = _env_int("RESPONSE_CACHE_MAX_ENTRIES", 256)
+
+# Admission control (app/admission.py): reads and order writes each get a cap
+# on requests in progress and on requests queued for a slot; the rest are
+# answered with 503 and Retry-After
+ADMISSION_CONTROL = _env_bool("ADMISSION_CONTROL", False)
+ADMISSION_READ_MAX_CONCURRENCY = _env_int("ADMISSION_READ_MAX_CONCURRENCY", 32)
+ADMISSION_READ_MAX_QUEUE = _env_int("ADMISSION_READ_MAX_QUEUE", 64)
+ADMISSION_WRITE_MAX_CONCURRENCY = _env_int("ADMISSION_WRITE_MAX_CONCURRENCY", 16)
+ADMISSION_WRITE_MAX_QUEUE = _env_int("ADMISSION_WRITE_MAX_QUEUE", 32)
+ADMISSION_MAX_QUEUE_WAIT_MS = _env_float("ADMISSION_MAX_QUEUE_WAIT_MS", 1000.0)
+ADMISSION_RETRY_AFTER_SECONDS = _env_int("ADMISSION_RETRY_AFTER_SECONDS", 1)
+
+# Logging (app/logging_config.py). Info logs tagged with a route are sampled:
+# LOG_SAMPLE_RATE applies to every route, LOG_SAMPLE_RATES ("route=rate,...")
+# overrides it per route template
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_SAMPLE_RATE = _env_float("LOG_SAMPLE_RATE", 1.0)
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
@@ -1,50 +1,77 @@
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from app import config
 import logging
 import asyncio
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 # Remove global database instance for serverless compatibility
 _client_cache = {}
 
+# Shared client for "server" mode, one per process
+_server_connection = None
+
+# Background connection warm-ups started by warm_up_connection
+_warm_up_tasks = set()
+
+def _new_client(**options):
+    """Build a Motor client with the settings shared by both connection modes.
+
+    Motor and pymongo are imported here rather than at module level: they are
+    a large part of the app's import time, and a cold start should not pay
+    for them before it has to.
+    """
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.database.monitoring import pool_monitor, command_monitor
+    
+    return AsyncIOMotorClient(
+        os.getenv("MONGODB_URL"),
+        serverSelectionTimeoutMS=5000,
+        connectTimeoutMS=5000,
+        socketTimeoutMS=5000,
+        event_listeners=[pool_monitor, command_monitor],
+        **options
+    )
+
 async def get_database():
     """Get database connection, creating a new one if needed for serverless compatibility"""
     try:
+        if config.MONGODB_CONNECTION_MODE == "server":
+            if _server_connection is None:
+                _create_server_connection()
+            return _server_connection['database']
+        
         # Get current event loop ID to ensure we use the right client
         loop_id = id(asyncio.get_running_loop())
         
         # Check if we have a client for this event loop
         if loop_id not in _client_cache or _client_cache[loop_id] is None:
-            await _create_connection_for_loop(loop_id)
+            _create_connection_for_loop(loop_id)
         
         return _client_cache[loop_id]['database']
     except Exception as e:
-        logger.error(f"Failed to get database: {e}")
+        logger.error("Failed to get database: %s", e)
         raise RuntimeError("Database connection not established")
 
-async def _create_connection_for_loop(loop_id):
-    """Create a new connection for the current event loop"""
+def _create_connection_for_loop(loop_id):
+    """Create the client for the current event loop.
+
+    No ping is issued: the driver connects on the first command, so the
+    request that creates the client does not wait for an extra round trip.
+    """
     try:
-        MONGODB_URL = os.getenv("MONGODB_URL")
         DATABASE_NAME = os.getenv("DATABASE_NAME", "ecommerce_db")
         
-        logger.info(f"Creating new MongoDB connection for loop {loop_id}")
+        logger.info("Creating new MongoDB connection for loop %s", loop_id)
         
         # Create new client with serverless-optimized configuration
-        client = AsyncIOMotorClient(
-            MONGODB_URL,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=5000,          
-            socketTimeoutMS=5000,           
+        client = _new_client(
             maxPoolSize=1,  # Single connection for serverless
             minPoolSize=0,
             maxIdleTimeMS=10000,
         )
         
-        # Test the connection
-        await client.admin.command('ping')
-        
         database = client[DATABASE_NAME]
         
         # Store in cache for this event loop
@@ -53,32 +80,115 @@ async def _create_connection_for_loop(loop_id):
             'database': database
         }
         
-        logger.info(f"Successfully connected to MongoDB database: {DATABASE_NAME}")
-        
-    except Exception as e:
-        logger.error(f"Error connecting to MongoDB: {e}")
+    except Exception:
         _client_cache[loop_id] = None
         raise
 
+def _create_server_connection():
+    """Create the process-wide pooled client used in "server" mode.
+
+    No ping is issued here: the driver connects lazily, so this never adds a
+    round trip to the request that happens to create the client.
+    """
+    global _server_connection
+    
+    DATABASE_NAME = os.getenv("DATABASE_NAME", "ecommerce_db")
+    
+    logger.info(
+        "Creating pooled MongoDB client (minPoolSize=%d, maxPoolSize=%d)",
+        config.MONGODB_MIN_POOL_SIZE, config.MONGODB_MAX_POOL_SIZE
+    )
+    
+    client = _new_client(
+        maxPoolSize=config.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=config.MONGODB_MIN_POOL_SIZE,
+    )
+    
+    _server_connection = {
+        'client': client,
+        'database': client[DATABASE_NAME]
+    }
+
+async def _prewarm_server_connection():
+    """Open minPoolSize connections up front so early requests do not pay for the handshakes"""
+    client = _server_connection['client']
+    # Concurrent commands each check out their own connection
+    await asyncio.gather(*(
+        client.admin.command('ping')
+        for _ in range(max(config.MONGODB_MIN_POOL_SIZE, 1))
+    ))
+    logger.info("Pre-warmed MongoDB pool: %d connections open", get_pool_stats()['open_connections'])
+
+def warm_up_connection():
+    """Start connecting this event loop's client in the background.
+
+    Called at startup in serverless mode, where nothing awaits it: the driver
+    import, the client and the first connection are set up while the app
+    starts taking requests. A request that arrives first uses the same client
+    and only waits for whatever setup is still in progress.
+    """
+    task = asyncio.get_running_loop().create_task(_warm_up())
+    _warm_up_tasks.add(task)
+    task.add_done_callback(_warm_up_tasks.discard)
+
+async def _warm_up():
+    try:
+        # The driver import is CPU-bound, so it runs on a thread
+        await asyncio.get_running_loop().run_in_executor(None, _import_driver)
+        database = await get_database()
+        await database.command('ping')
+        logger.info("MongoDB connection warmed up")
+    except Exception as e:
+        # Requests will connect (and report errors) on their own
+        logger.warning("MongoDB connection warm-up failed: %s", e)
+
+def _import_driver():
+    import motor.motor_asyncio
+    import app.database.monitoring
+
 async def connect_to_mongo():
     """Create database connection - simplified for serverless"""
+    if config.MONGODB_CONNECTION_MODE == "server":
+        if _server_connection is None:
+            _create_server_connection()
+        await _prewarm_server_connection()
+        return
+    
     loop_id = id(asyncio.get_running_loop())
-    await _create_connection_for_loop(loop_id)
+    _create_connection_for_loop(loop_id)
+    await (await get_database()).command('ping')
 
 async def close_mongo_connection():
     """Close database connections for all event loops"""
+    global _server_connection
     try:
+        for task in list(_warm_up_tasks):
+            task.cancel()
         for loop_id, connection_info in _client_cache.items():
             if connection_info and connection_info['client']:
                 connection_info['client'].close()
         _client_cache.clear()
+        if _server_connection is not None:
+            _server_connection['client'].close()
+            _server_connection = None
         logger.info("Disconnected from MongoDB")
     except Exception as e:
-        logger.error(f"Error disconnecting from MongoDB: {e}")
+        logger.error("Error disconnecting from MongoDB: %s", e)
 
 async def get_collection(collection_name: str):
     """Get a collection from the database"""
     database = await get_database()
     if database is None:
         raise RuntimeError("Database connection not available")
-    return database[collection_name]
\ No newline at end of file
+    return database[collection_name]
+
+def get_pool_stats():
+    """Connection pool checkout and usage counters"""
+    from app.database.monitoring import pool_monitor
+    
+    return dict(pool_monitor.stats(), mode=config.MONGODB_CONNECTION_MODE)
+
+def utcnow():
+    """Current UTC time truncated to the millisecond precision BSON dates are stored with"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""Declarative index registry and query-plan checks.
+
+Usage:
+    python -m app.database.indexes ensure   # create any missing indexes
+    python -m app.database.indexes verify   # fail if a service query would scan a whole collection
+"""
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+import bson
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Indexes every service query relies on, by collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "orders": [
+        # get_user_orders: filter on userId, newest first
+        IndexModel([("userId", ASCENDING), ("_id", DESCENDING)], name="userId_1__id_-1"),
+    ],
+    "products": [
+        # get_products size filter, paged on _id
+        IndexModel([("sizes.size", ASCENDING), ("_id", ASCENDING)], name="sizes.size_1__id_1"),
+        # get_products name search scans this index rather than the collection
+        IndexModel([("name", ASCENDING)], name="name_1"),
+        # PRODUCT_SEARCH_MODE=prefix: range scans on the normalized name
+        IndexModel([("name_normalized", ASCENDING)], name="name_normalized_1"),
+        # PRODUCT_SEARCH_MODE=ngram: multikey index over the name n-grams
+        IndexModel([("name_ngrams", ASCENDING)], name="name_ngrams_1"),
+    ],
+}
+
+
+class QueryPlanError(RuntimeError):
+    """Raised when a service query's winning plan scans the whole collection"""
+
+# indexBounds of an index field the scan does not narrow, in either direction
+_UNBOUNDED = (["[MinKey, MaxKey]"], ["[MaxKey, MinKey]"])
+
+
+def _representative_queries() -> List[Tuple[str, str, Dict[str, Any], List[Tuple[str, int]]]]:
+    """The queries the services issue, as (label, collection, filter, sort)"""
+    return [
+        ("get_user_orders", "orders", {"userId": "user"}, [("_id", DESCENDING)]),
+        ("get_user_orders (cursor)", "orders",
+         {"userId": "user", "_id": {"$lt": bson.ObjectId()}}, [("_id", DESCENDING)]),
+        ("get_products", "products", {}, [("_id", ASCENDING)]),
+        ("get_products (size)", "products", {"sizes.size": "M"}, [("_id", ASCENDING)]),
+        # PRODUCT_SEARCH_MODE=regex is an unanchored, case-insensitive match
+        # that no index can narrow, so it is not checked here
+        ("get_products (name, prefix mode)", "products",
+         {"name_normalized": {"$gte": "shirt", "$lt": "shiru"}}, [("_id", ASCENDING)]),
+        ("get_products (name, ngram mode)", "products",
+         {"name_ngrams": {"$all": ["hir", "irt", "shi"]}, "name_normalized": {"$regex": "shirt"}},
+         [("_id", ASCENDING)]),
+        ("get_products_by_ids", "products", {"_id": {"$in": [bson.ObjectId()]}}, []),
+    ]
+
+
+async def ensure_indexes(database) -> None:
+    """Create every registered index; existing identical indexes are left alone"""
+    for collection_name, indexes in INDEXES.items():
+        names = await database[collection_name].create_indexes(indexes)
+        logger.info("Ensured indexes on %s: %s", collection_name, ", ".join(names))
+
+
+def _plan_stages(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield every stage in an explain plan tree"""
+    if "stage" in plan:
+        yield plan
+    if "queryPlan" in plan:
+        yield from _plan_stages(plan["queryPlan"])
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for stage in plan.get("inputStages", []):
+        yield from _plan_stages(stage)
+
+
+def _narrowed_fields(stages: List[Dict[str, Any]]) -> Set[str]:
+    """Fields whose index bounds limit some IXSCAN in the plan"""
+    fields = set()
+    for stage in stages:
+        if stage["stage"] == "IXSCAN":
+            fields.update(
+                field for field, bounds in stage.get("indexBounds", {}).items()
+                if bounds not in _UNBOUNDED
+            )
+    return fields
+
+
+async def verify_query_plans(database) -> None:
+    """Explain each service query and raise QueryPlanError if it scans the whole collection.
+
+    A COLLSCAN fails, and so does a plan that filters on fields no index
+    scan narrows. The latter is what a missing index usually looks like:
+    the planner then walks the whole ``_id_`` index, which provides the
+    ``_id`` sort, rather than fall back to a COLLSCAN.
+    """
+    failures = []
+    for label, collection_name, filter_query, sort in _representative_queries():
+        cursor = database[collection_name].find(filter_query).limit(11)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+
+        stages = list(_plan_stages(explanation["queryPlanner"]["winningPlan"]))
+        logger.info("%s: %s", label, " <- ".join(
+            f"{stage['stage']}({stage['indexName']})" if "indexName" in stage else stage["stage"]
+            for stage in stages
+        ))
+        filtered_fields = set(filter_query) - {"_id"}
+        if any(stage["stage"] == "COLLSCAN" for stage in stages) or (
+            filtered_fields and not filtered_fields & _narrowed_fields(stages)
+        ):
+            failures.append(label)
+
+    if failures:
+        raise QueryPlanError(f"Whole collection scanned by winning plan for: {', '.join(failures)}")
+
+
+async def _main(command: str) -> None:
+    from app.database.connection import get_database, close_mongo_connection
+
+    try:
+        database = await get_database()
+        if command == "ensure":
+            await ensure_indexes(database)
+        else:
+            await verify_query_plans(database)
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) != 2 or sys.argv[1] not in ("ensure", "verify"):
+        print(__doc__)
+        sys.exit(2)
+    try:
+        asyncio.run(_main(sys.argv[1]))
+    except QueryPlanError as e:
+        logger.error(str(e))
+        sys.exit(1)
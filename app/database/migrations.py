@@ -0,0 +1,147 @@
+"""One-off data migrations.
+
+Usage:
+    python -m app.database.migrations normalize-orders
+    python -m app.database.migrations backfill-product-search
+    python -m app.database.migrations rebuild-user-stats
+"""
+import asyncio
+import logging
+import sys
+
+from pymongo import UpdateOne
+
+from app.services.order_service import USER_STATS_COLLECTION
+from app.services.search import search_fields
+
+logger = logging.getLogger(__name__)
+
+# Orders still using a legacy layout: product_id/product_name item fields,
+# a "total" instead of "totalAmount", ObjectId product IDs or missing fields
+_LEGACY_ORDER_FILTER = {
+    "$or": [
+        {"total": {"$exists": True}},
+        {"totalAmount": {"$exists": False}},
+        {"status": {"$exists": False}},
+        {"items": {"$exists": False}},
+        {"items.product_id": {"$exists": True}},
+        {"items.product_name": {"$exists": True}},
+        {"items.productId": {"$type": "objectId"}},
+        {"items": {"$elemMatch": {"$or": [
+            {"productId": {"$exists": False}},
+            {"name": {"$exists": False}},
+            {"qty": {"$exists": False}},
+        ]}}},
+    ]
+}
+
+# Applies the same fallbacks get_user_orders used to apply on every read
+_NORMALIZE_ORDER_PIPELINE = [
+    {"$set": {
+        "items": {
+            "$map": {
+                "input": {
+                    # Items without any product ID were never returned; drop them
+                    "$filter": {
+                        "input": {"$ifNull": ["$items", []]},
+                        "as": "item",
+                        "cond": {"$ifNull": ["$$item.productId", "$$item.product_id"]},
+                    }
+                },
+                "as": "item",
+                "in": {
+                    "$mergeObjects": [
+                        "$$item",
+                        {
+                            "productId": {"$toString": {"$ifNull": ["$$item.productId", "$$item.product_id"]}},
+                            "name": {"$ifNull": [
+                                "$$item.name",
+                                {"$ifNull": ["$$item.product_name", "Unknown Product"]},
+                            ]},
+                            "qty": {"$ifNull": ["$$item.qty", 1]},
+                        },
+                    ]
+                },
+            }
+        },
+        "totalAmount": {"$ifNull": ["$totalAmount", {"$ifNull": ["$total", 0]}]},
+        "status": {"$ifNull": ["$status", "created"]},
+    }},
+    {"$unset": ["total", "items.product_id", "items.product_name"]},
+]
+
+
+async def normalize_legacy_orders(database) -> int:
+    """Rewrite legacy orders into the layout create_order writes; returns the number changed"""
+    result = await database["orders"].update_many(_LEGACY_ORDER_FILTER, _NORMALIZE_ORDER_PIPELINE)
+    logger.info("Normalized %d legacy orders", result.modified_count)
+    return result.modified_count
+
+
+async def backfill_product_search_fields(database, chunk_size: int = 1000) -> int:
+    """Add name_normalized/name_ngrams to products created before they existed"""
+    collection = database["products"]
+    cursor = collection.find(
+        {"name_ngrams": {"$exists": False}},
+        {"name": 1}
+    ).batch_size(chunk_size)
+
+    updated = 0
+    updates = []
+    async for product in cursor:
+        updates.append(UpdateOne({"_id": product["_id"]}, {"$set": search_fields(product.get("name", ""))}))
+        if len(updates) >= chunk_size:
+            updated += (await collection.bulk_write(updates, ordered=False)).modified_count
+            updates = []
+    if updates:
+        updated += (await collection.bulk_write(updates, ordered=False)).modified_count
+
+    logger.info("Backfilled search fields on %d products", updated)
+    return updated
+
+
+async def rebuild_user_order_stats(database) -> int:
+    """Recompute user_order_stats from the orders collection; returns the number of users.
+
+    The collection is replaced in one step by ``$out``. Orders created while
+    the aggregation runs may be missing from the result, so run it when order
+    writes are paused, or run it again afterwards.
+    """
+    pipeline = [
+        {"$group": {
+            "_id": "$userId",
+            "orderCount": {"$sum": 1},
+            "totalSpend": {"$sum": "$totalAmount"},
+            "lastOrderAt": {"$max": "$createdAt"},
+        }},
+        {"$out": USER_STATS_COLLECTION},
+    ]
+    await database["orders"].aggregate(pipeline).to_list(length=None)
+
+    users = await database[USER_STATS_COLLECTION].estimated_document_count()
+    logger.info("Rebuilt order stats for %d users", users)
+    return users
+
+
+_MIGRATIONS = {
+    "normalize-orders": normalize_legacy_orders,
+    "backfill-product-search": backfill_product_search_fields,
+    "rebuild-user-stats": rebuild_user_order_stats,
+}
+
+
+async def _main(name: str) -> None:
+    from app.database.connection import get_database, close_mongo_connection
+
+    try:
+        await _MIGRATIONS[name](await get_database())
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) != 2 or sys.argv[1] not in _MIGRATIONS:
+        print(__doc__)
+        sys.exit(2)
+    asyncio.run(_main(sys.argv[1]))
@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+from app import metrics
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks connection pool checkouts so queueing on the pool is visible.
+
+    Motor runs pymongo on executor threads, so the callbacks fire on those
+    threads; a checkout's start time is kept thread-locally because the
+    started and finished events of one checkout happen on the same thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": (self.total_wait_seconds / self.checkouts * 1000) if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+    def _finish_wait(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        self.waiting -= 1
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            wait = self._finish_wait()
+            self.in_use += 1
+            self.checkouts += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._finish_wait()
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Records MongoDB command durations per command and collection.
+
+    The collection is only present on the started event, so it is kept by
+    request id until the matching succeeded/failed event arrives.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections: Dict[Any, str] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        with self._lock:
+            self._collections[(event.request_id, event.connection_id)] = collection
+
+        counter = metrics.request_command_count.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def _finish(self, event) -> str:
+        with self._lock:
+            return self._collections.pop((event.request_id, event.connection_id), "")
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        metrics.mongodb_command_duration.observe(event.duration_micros / 1e6, event.command_name, collection)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        metrics.mongodb_command_duration.observe(event.duration_micros / 1e6, event.command_name, collection)
+        metrics.mongodb_command_failures.inc(event.command_name, collection)
+
+
+pool_monitor = PoolMonitor()
+command_monitor = CommandMonitor()
+
+metrics.registry.add_stats("mongodb_pool", "MongoDB connection pool counters", pool_monitor.stats)
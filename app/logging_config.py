@@ -0,0 +1,159 @@
+"""Application logging: a background writer, structured fields and sampling.
+
+Records are put on an in-memory queue by the calling thread and formatted
+and written by a QueueListener thread, so the event loop never waits on
+stderr. Messages use %-style arguments, which are only merged on the
+listener thread. Fields passed with ``extra=`` are written as key=value
+pairs (LOG_FORMAT=text) or JSON keys (LOG_FORMAT=json).
+
+Info and debug records carrying a ``route`` field are per-request logs and
+are sampled: LOG_SAMPLE_RATE keeps that fraction of them and
+LOG_SAMPLE_RATES overrides it per route template, e.g.
+``/orders/{user_id}=0.01``. Warnings and errors are never sampled.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app import config, metrics
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_sampler: Optional["RequestLogSampler"] = None
+_lock = threading.Lock()
+
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    """``route=rate,route=rate`` as a dict; route templates may not contain commas"""
+    rates = {}
+    for item in value.split(","):
+        route, separator, rate = item.strip().rpartition("=")
+        if separator and route:
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+
+class RequestLogSampler(logging.Filter):
+    """Keeps a configurable fraction of info/debug records that carry a ``route``"""
+
+    def __init__(self, default_rate: float, rates: Dict[str, float]):
+        super().__init__()
+        self.default_rate = default_rate
+        self.rates = rates
+        self.kept = 0
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        route = getattr(record, "route", None)
+        if route is None:
+            return True
+        rate = self.rates.get(route, self.default_rate)
+        if rate >= 1 or (rate > 0 and random.random() < rate):
+            self.kept += 1
+            return True
+        self.dropped += 1
+        return False
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats the message (and any traceback) in the
+    calling thread; here the record is queued as is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging() -> None:
+    """Route the root logger through the background queue; safe to call more than once"""
+    global _listener, _queue_handler, _sampler
+
+    with _lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        if config.LOG_FORMAT == "json":
+            stream_handler.setFormatter(JSONFormatter())
+        else:
+            stream_handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        log_queue = queue.SimpleQueue()
+        _sampler = RequestLogSampler(config.LOG_SAMPLE_RATE, _parse_sample_rates(config.LOG_SAMPLE_RATES))
+        _queue_handler = _DeferredQueueHandler(log_queue)
+        # Sampled-out records are dropped before they are queued
+        _queue_handler.addFilter(_sampler)
+
+        root = logging.getLogger()
+        root.setLevel(config.LOG_LEVEL)
+        root.addHandler(_queue_handler)
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out every queued record and stop the listener thread"""
+    global _listener, _queue_handler
+
+    with _lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    if _listener is None:
+        return {}
+    return {
+        "queued": _listener.queue.qsize(),
+        "sampled_kept": _sampler.kept,
+        "sampled_dropped": _sampler.dropped,
+    }
+
+
+metrics.registry.add_stats("logging", "Background logging queue and request log sampling", get_logging_stats)
@@ -0,0 +1,225 @@
+"""In-process metrics rendered in the Prometheus text format on GET /metrics.
+
+Metrics are recorded from the event loop and from Motor's executor threads
+(MongoDB command events), so updates take a short lock.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        for label_values, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le)} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._stats: List[Tuple[str, str, Callable[[], Dict[str, Any]], Optional[str]]] = []
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_stats(
+        self,
+        prefix: str,
+        help_text: str,
+        stats: Callable[[], Dict[str, Any]],
+        label_name: Optional[str] = None
+    ) -> None:
+        """Expose a ``stats()`` dict as gauges named ``<prefix>_<key>``.
+
+        With ``label_name`` the dict maps label values to stats dicts. Values
+        that are not numbers (None, nested dicts) are skipped.
+        """
+        self._stats.append((prefix, help_text, stats, label_name))
+
+    def _render_stats(self) -> Iterable[str]:
+        for prefix, help_text, stats, label_name in self._stats:
+            result = stats()
+            if not result:
+                continue
+            groups = result.items() if label_name else [(None, result)]
+
+            samples: Dict[str, List[str]] = {}
+            for label_value, values in groups:
+                if not isinstance(values, dict):
+                    continue
+                labels = f'{{{label_name}="{_escape(label_value)}"}}' if label_name else ""
+                for key, value in values.items():
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    samples.setdefault(f"{prefix}_{key}", []).append(f"{prefix}_{key}{labels} {_format_value(value)}")
+
+            for name, lines in samples.items():
+                yield f"# HELP {name} {help_text}"
+                yield f"# TYPE {name} gauge"
+                yield from lines
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.extend(self._render_stats())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command round trip time as reported by the driver",
+    ("command", "collection"),
+)
+
+mongodb_command_failures = registry.counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error",
+    ("command", "collection"),
+)
+
+mongodb_commands_per_request = registry.histogram(
+    "mongodb_commands_per_request",
+    "MongoDB round trips issued while handling one HTTP request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 4, 5, 10, 20, 50),
+)
+
+# Set per request by MetricsMiddleware; Motor copies the context into its
+# executor threads, so the command listener can count round trips on it
+request_command_count: ContextVar[Optional[List[int]]] = ContextVar("request_command_count", default=None)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and MongoDB round trips"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        command_count = [0]
+        token = request_command_count.set(command_count)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_command_count.reset(token)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            http_request_duration.observe(elapsed, scope["method"], route_path, str(status_code))
+            mongodb_commands_per_request.observe(command_count[0], route_path)
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, HTTPException, Query, Path, status
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from app.schemas.schemas import (
     OrderCreateSchema,
     OrderListResponseSchema,
-    OrderResponseSchema
+    OrderResponseSchema,
+    UserOrderSummarySchema
 )
+from app.serialization import FastJSONResponse
+from app import config, metrics
 from app.services.order_service import OrderService
 from pydantic import ValidationError
 import logging
@@ -13,6 +17,12 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+metrics.registry.add_stats(
+    "order_write_batcher",
+    "Order insert group-commit counters",
+    OrderService.get_write_batcher_stats
+)
+
 @router.post("/", response_model=OrderResponseSchema, status_code=status.HTTP_201_CREATED)
 async def create_order(order: OrderCreateSchema):
     """Create a new order"""
@@ -22,25 +32,31 @@ async def create_order(order: OrderCreateSchema):
     except ValueError as e:
         error_msg = str(e)
         if "not found" in error_msg:
-            logger.error(f"Product not found error creating order: {e}")
+            logger.info("Order rejected, product not found: %s", e, extra={"route": "/orders/"})
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=str(e)
             )
+        elif "Insufficient stock" in error_msg:
+            logger.info("Order rejected, stock unavailable: %s", e, extra={"route": "/orders/"})
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e)
+            )
         else:
-            logger.error(f"Validation error creating order: {e}")
+            logger.info("Order rejected: %s", e, extra={"route": "/orders/"})
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail=str(e)
             )
     except ValidationError as e:
-        logger.error(f"Validation error creating order: {e}")
+        logger.info("Order rejected: %s", e, extra={"route": "/orders/"})
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(e)
         )
-    except Exception as e:
-        logger.error(f"Error creating order: {e}")
+    except Exception:
+        logger.exception("Error creating order", extra={"route": "/orders/"})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create order"
@@ -50,26 +66,57 @@ async def create_order(order: OrderCreateSchema):
 async def get_user_orders(
     user_id: str = Path(..., description="User ID to get orders for"),
     limit: int = Query(10, ge=1, le=100, description="Number of items to return"),
-    offset: int = Query(0, ge=0, description="Number of items to skip")
+    offset: int = Query(0, ge=0, description="Number of items to skip"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from page.next_cursor; takes precedence over offset"),
+    include_total: bool = Query(False, description="Also return the total number of matching items in page.total")
 ):
     """Get orders for a specific user with pagination"""
     try:
-        logger.info(f"Fetching orders for user: {user_id}, limit: {limit}, offset: {offset}")
-        
         result = await OrderService.get_user_orders(
             user_id=user_id,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total
         )
         
-        logger.info(f"Successfully retrieved {len(result.get('data', []))} orders for user {user_id}")
+        logger.info(
+            "Retrieved %d orders", len(result["data"]),
+            extra={"route": "/orders/{user_id}", "user_id": user_id, "limit": limit, "offset": offset}
+        )
+        if config.FAST_JSON_RESPONSES:
+            return FastJSONResponse(result)
         return result
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
-        logger.error(f"Error getting user orders for user {user_id}: {e}")
-        logger.error(f"Error type: {type(e).__name__}")
-        logger.error(f"Error details: {str(e)}", exc_info=True)
+        logger.exception("Error getting user orders", extra={"route": "/orders/{user_id}", "user_id": user_id})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve orders: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/{user_id}/export")
+async def export_user_orders(
+    user_id: str = Path(..., description="User ID to export orders for")
+):
+    """Stream a user's full order history as NDJSON"""
+    return StreamingResponse(OrderService.export_user_orders(user_id), media_type="application/x-ndjson")
+
+@router.get("/{user_id}/summary", response_model=UserOrderSummarySchema)
+async def get_user_order_summary(
+    user_id: str = Path(..., description="User ID to summarize orders for")
+):
+    """Get a user's order count, lifetime spend and last order time"""
+    try:
+        return await OrderService.get_user_summary(user_id)
+    except Exception:
+        logger.exception("Error getting order summary", extra={"route": "/orders/{user_id}/summary", "user_id": user_id})
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve order summary"
+        )
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional
 from app.schemas.schemas import (
     ProductCreateSchema, 
     ProductListResponseSchema, 
-    ProductResponseSchema
+    ProductResponseSchema,
+    ProductFacetsResponseSchema
 )
+from app.serialization import dumps
+from app import config, metrics
+from app.services.cache import TTLCache
 from app.services.product_service import ProductService
 from pydantic import ValidationError
 import logging
@@ -13,6 +19,33 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Serialized GET /products/ bodies, keyed by their ETag
+_response_cache = TTLCache(config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_TTL_SECONDS)
+
+def _cache_stats() -> dict:
+    stats = ProductService.get_cache_stats()
+    stats.pop("coalescing")
+    stats["responses"] = _response_cache.stats()
+    return stats
+
+metrics.registry.add_stats("cache", "In-process cache counters", _cache_stats, label_name="cache")
+metrics.registry.add_stats(
+    "product_read_coalescing",
+    "Catalog reads that shared an in-flight query",
+    lambda: ProductService.get_cache_stats()["coalescing"]
+)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def _render_product_list(result: dict) -> bytes:
+    if config.FAST_JSON_RESPONSES:
+        return dumps(result)
+    return JSONResponse(jsonable_encoder(ProductListResponseSchema.model_validate(result))).body
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_product(product: ProductCreateSchema):
     """Create a new product"""
@@ -25,37 +58,99 @@ async def create_product(product: ProductCreateSchema):
         
         return product_data
     except ValidationError as e:
-        logger.error(f"Validation error creating product: {e}")
+        logger.info("Product rejected: %s", e, extra={"route": "/products/"})
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(e)
         )
-    except Exception as e:
-        logger.error(f"Error creating product: {e}")
+    except Exception:
+        logger.exception("Error creating product", extra={"route": "/products/"})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create product"
         )
 
+@router.post("/bulk")
+async def import_products(request: Request):
+    """Bulk import products from an NDJSON body (one product per line)"""
+    try:
+        return await ProductService.import_products(request.stream())
+    except Exception:
+        logger.exception("Error importing products", extra={"route": "/products/bulk"})
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import products"
+        )
+
 @router.get("/", response_model=ProductListResponseSchema)
 async def get_products(
+    request: Request,
     name: Optional[str] = Query(None, description="Filter by product name (partial search)"),
     size: Optional[str] = Query(None, description="Filter by size availability"),
     limit: int = Query(10, ge=1, le=100, description="Number of items to return"),
-    offset: int = Query(0, ge=0, description="Number of items to skip")
+    offset: int = Query(0, ge=0, description="Number of items to skip"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from page.next_cursor; takes precedence over offset"),
+    include_total: bool = Query(False, description="Also return the total number of matching items in page.total")
 ):
-    """Get products with optional filtering and pagination"""
+    """Get products with optional filtering and pagination.
+
+    Responses carry an ETag; a matching If-None-Match is answered with 304
+    without querying MongoDB.
+    """
     try:
-        result = await ProductService.get_products(
+        params = dict(
             name=name,
             size=size,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total
         )
-        return result
-    except Exception as e:
-        logger.error(f"Error getting products: {e}")
+        etag = ProductService.get_listing_etag(**params)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        body = _response_cache.get(etag)
+        if body is None:
+            result = await ProductService.get_products(**params)
+            body = _render_product_list(result)
+            _response_cache.set(etag, body)
+        
+        return Response(content=body, media_type="application/json", headers=headers)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception:
+        logger.exception("Error getting products", extra={"route": "/products/"})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve products"
-        )
\ No newline at end of file
+        )
+
+@router.get("/facets", response_model=ProductFacetsResponseSchema)
+async def get_product_facets(
+    name: Optional[str] = Query(None, description="Only count products matching this name search")
+):
+    """Get the number of products available in each size"""
+    try:
+        return {"sizes": await ProductService.get_size_facets(name)}
+    except Exception:
+        logger.exception("Error getting product facets", extra={"route": "/products/facets"})
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve product facets"
+        )
+
+@router.get("/export")
+async def export_products():
+    """Stream the whole catalog as NDJSON"""
+    return StreamingResponse(ProductService.export_products(), media_type="application/x-ndjson")
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Product cache counters, for sizing the cache"""
+    return dict(ProductService.get_cache_stats(), responses=_response_cache.stats())
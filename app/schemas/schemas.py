@@ -34,9 +34,18 @@ class ProductListResponseSchema(BaseModel):
     data: List[ProductResponseSchema]
     page: dict
 
+class SizeFacetSchema(BaseModel):
+    size: str
+    count: int
+
+class ProductFacetsResponseSchema(BaseModel):
+    sizes: List[SizeFacetSchema]
+
 class OrderItemSchema(BaseModel):
     productId: str
     qty: int = Field(gt=0)
+    # Items with a size reserve stock from that size's quantity
+    size: Optional[str] = None
 
 class OrderCreateSchema(BaseModel):
     userId: str = Field(..., min_length=1)
@@ -71,4 +80,10 @@ class OrderResponseSchema(BaseModel):
 
 class OrderListResponseSchema(BaseModel):
     data: List[OrderResponseSchema]
-    page: dict
\ No newline at end of file
+    page: dict
+
+class UserOrderSummarySchema(BaseModel):
+    userId: str
+    orderCount: int = 0
+    totalSpend: float = 0.0
+    lastOrderAt: Optional[datetime] = None
\ No newline at end of file
@@ -0,0 +1,29 @@
+from typing import Any
+
+import bson
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(value: Any) -> Any:
+    # orjson handles datetimes natively; ObjectIds are the only BSON type left
+    if isinstance(value, bson.ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any, append_newline: bool = False) -> bytes:
+    """Serialize service output (including datetimes and ObjectIds) to JSON bytes"""
+    option = orjson.OPT_APPEND_NEWLINE if append_newline else 0
+    return orjson.dumps(content, default=_default, option=option)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Returning this from a route skips FastAPI's response_model validation and
+    encoding, so it must only wrap content already in the documented shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,39 @@
+from typing import AsyncIterator, Callable, Optional
+
+from app.serialization import dumps
+
+# Rows are grouped into chunks of about this size before being sent
+_EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def to_ndjson_line(row: dict) -> bytes:
+    """Serialize one row as a newline-terminated JSON line"""
+    return dumps(row, append_newline=True)
+
+
+async def stream_ndjson(
+    cursor,
+    transform: Optional[Callable[[dict], Optional[dict]]] = None
+) -> AsyncIterator[bytes]:
+    """Stream a Motor cursor as NDJSON chunks, one document per line.
+
+    Documents are passed through ``transform`` when given, and skipped if it
+    returns None. Only one chunk of serialized rows is held in memory at a
+    time.
+    """
+    chunk = []
+    chunk_bytes = 0
+    async for document in cursor:
+        row = transform(document) if transform else document
+        if row is None:
+            continue
+        line = to_ndjson_line(row)
+        chunk.append(line)
+        chunk_bytes += len(line)
+        if chunk_bytes >= _EXPORT_CHUNK_BYTES:
+            yield b"".join(chunk)
+            chunk = []
+            chunk_bytes = 0
+
+    if chunk:
+        yield b"".join(chunk)
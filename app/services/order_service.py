@@ -1,147 +1,296 @@
 import bson
-from typing import List, Optional, Dict, Any
-from app.database.connection import get_collection
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+from app.database.connection import get_collection, utcnow
 from app.schemas.schemas import OrderCreateSchema, OrderItemSchema
 from app.services.product_service import ProductService
+from app.services.pagination import decode_cursor, next_cursor
+from app.services.write_batcher import WriteBatcher
+from app.services.export import stream_ndjson
+from app import config
+import asyncio
 import logging
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# One document per user ({_id: userId, orderCount, totalSpend, lastOrderAt}),
+# kept current by create_order; rebuild with
+# "python -m app.database.migrations rebuild-user-stats"
+USER_STATS_COLLECTION = "user_order_stats"
+
+# Reshapes stored orders into the API response shape inside MongoDB, so only
+# the needed fields leave the server. Assumes the current order layout; run
+# "python -m app.database.migrations normalize-orders" to convert legacy orders.
+_ORDER_RESPONSE_PROJECTION = {
+    "_id": {"$toString": "$_id"},
+    "userId": 1,
+    "items": {
+        "$map": {
+            "input": "$items",
+            "as": "item",
+            "in": {
+                "productDetails": {"name": "$$item.name", "id": "$$item.productId"},
+                "qty": "$$item.qty"
+            }
+        }
+    },
+    "totalAmount": 1,
+    "createdAt": 1,
+    "status": 1
+}
+
+# Order insert batchers, one per event loop like the database clients
+_order_batchers = {}
+
+def _get_order_batcher() -> WriteBatcher:
+    loop_id = id(asyncio.get_running_loop())
+    if loop_id not in _order_batchers:
+        _order_batchers[loop_id] = WriteBatcher(
+            "orders",
+            max_delay_ms=config.ORDER_BATCH_MAX_DELAY_MS,
+            max_batch_size=config.ORDER_BATCH_MAX_SIZE
+        )
+    return _order_batchers[loop_id]
+
 class OrderService:
     
     @staticmethod
     async def create_order(order_data: OrderCreateSchema) -> Dict[str, Any]:
         """Create a new order and return full order details"""
-        try:
-            collection = await get_collection("orders")
+        collection = await get_collection("orders")
+        
+        # Merge repeated lines so each product and size is priced and reserved once
+        quantities: Dict[Tuple[str, Optional[str]], int] = {}
+        for item in order_data.items:
+            key = (item.productId, item.size)
+            quantities[key] = quantities.get(key, 0) + item.qty
+        
+        product_ids = list(dict.fromkeys(product_id for product_id, _ in quantities))
+        products = await ProductService.get_products_by_ids(product_ids)
+        
+        missing_ids = [product_id for product_id in product_ids if product_id not in products]
+        if missing_ids:
+            raise ValueError(f"Products with IDs {', '.join(missing_ids)} not found")
+        
+        total_amount = 0.0
+        validated_items = []
+        reservations = []
+        
+        for (product_id, size), qty in quantities.items():
+            product = products[product_id]
             
-            total_amount = 0.0
-            validated_items = []
+            item_total = product["price"] * qty
+            total_amount += item_total
             
-            for item in order_data.items:
-                product = await ProductService.get_product_by_id(item.productId)
-                if not product:
-                    raise ValueError(f"Product with ID {item.productId} not found")
-                
-                item_total = product["price"] * item.qty
-                total_amount += item_total
-                
-                validated_items.append({
-                    "productId": item.productId,
-                    "qty": item.qty,
-                    "price": product["price"],
-                    "name": product["name"]
-                })
-            
-            order_dict = {
-                "userId": order_data.userId,
-                "items": validated_items,
-                "totalAmount": total_amount,
-                "createdAt": datetime.utcnow(),
-                "status": "created"
+            validated_item = {
+                "productId": product_id,
+                "qty": qty,
+                "price": product["price"],
+                "name": product["name"]
             }
-            
-            result = await collection.insert_one(order_dict)
-            
-            created_order = await collection.find_one({"_id": result.inserted_id})
-            
-            formatted_items = []
-            for item in created_order["items"]:
-                formatted_items.append({
-                    "productDetails": {
-                        "name": item["name"],
-                        "id": item["productId"]
-                    },
-                    "qty": item["qty"]
-                })
-            
-            return {
-                "id": str(created_order["_id"]),
-                "userId": created_order["userId"],
-                "items": formatted_items,
-                "totalAmount": created_order["totalAmount"],
-                "createdAt": created_order["createdAt"]
-            }
-            
-        except Exception as e:
-            logger.error(f"Error creating order: {e}")
+            # Items without a size are accepted as before and do not touch stock
+            if size is not None:
+                if size not in {entry["size"] for entry in product.get("sizes", [])}:
+                    raise ValueError(f"Size {size} is not available for product {product_id}")
+                validated_item["size"] = size
+                reservations.append((product_id, size, qty))
+            validated_items.append(validated_item)
+        
+        order_dict = {
+            "userId": order_data.userId,
+            "items": validated_items,
+            "totalAmount": total_amount,
+            "createdAt": utcnow(),
+            "status": "created"
+        }
+        
+        await ProductService.reserve_stock(reservations)
+        try:
+            if config.ORDER_WRITE_BATCHING:
+                inserted_id = await _get_order_batcher().insert(order_dict)
+            else:
+                result = await collection.insert_one(order_dict)
+                inserted_id = result.inserted_id
+        except Exception:
+            # The order was not written, so its stock goes back
+            await ProductService.release_stock(reservations)
             raise
+        await OrderService._record_user_stats(order_dict)
+        
+        # The response is built from the document just written, not read back
+        formatted_items = []
+        for item in order_dict["items"]:
+            formatted_items.append({
+                "productDetails": {
+                    "name": item["name"],
+                    "id": item["productId"]
+                },
+                "qty": item["qty"]
+            })
+        
+        return {
+            "id": str(inserted_id),
+            "userId": order_dict["userId"],
+            "items": formatted_items,
+            "totalAmount": order_dict["totalAmount"],
+            "createdAt": order_dict["createdAt"]
+        }
+    
+    @staticmethod
+    async def _record_user_stats(order_dict: Dict[str, Any]) -> None:
+        """Fold a newly written order into its user's stats document.
+
+        When this order creates the document, the user's earlier orders
+        (written before the stats existed) are added to it, so upgrading
+        does not reset anyone's totals. The order is already stored at this
+        point, so a failure here is only logged; failing the request would
+        invite a retry and a duplicate order. The rebuild migration repairs
+        any drift.
+        """
+        try:
+            stats_collection = await get_collection(USER_STATS_COLLECTION)
+            result = await stats_collection.update_one(
+                {"_id": order_dict["userId"]},
+                {
+                    "$inc": {"orderCount": 1, "totalSpend": order_dict["totalAmount"]},
+                    "$max": {"lastOrderAt": order_dict["createdAt"]}
+                },
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                await OrderService._seed_user_stats(order_dict)
+        except Exception as e:
+            logger.error("Error updating order stats: %s", e, extra={"user_id": order_dict["userId"]})
+    
+    @staticmethod
+    async def _seed_user_stats(order_dict: Dict[str, Any]) -> None:
+        """Add a user's orders other than ``order_dict`` to their new stats document.
+
+        Another order of the same user written while this runs can end up
+        counted twice; the rebuild migration corrects that.
+        """
+        collection = await get_collection("orders")
+        earlier = await collection.aggregate([
+            {"$match": {"userId": order_dict["userId"], "_id": {"$ne": order_dict["_id"]}}},
+            {"$group": {
+                "_id": None,
+                "orderCount": {"$sum": 1},
+                "totalSpend": {"$sum": "$totalAmount"},
+                "lastOrderAt": {"$max": "$createdAt"}
+            }}
+        ]).to_list(length=1)
+        if not earlier:
+            return
+        
+        update = {"$inc": {"orderCount": earlier[0]["orderCount"], "totalSpend": earlier[0]["totalSpend"]}}
+        if earlier[0]["lastOrderAt"] is not None:
+            update["$max"] = {"lastOrderAt": earlier[0]["lastOrderAt"]}
+        
+        stats_collection = await get_collection(USER_STATS_COLLECTION)
+        await stats_collection.update_one({"_id": order_dict["userId"]}, update)
+    
+    @staticmethod
+    async def get_user_summary(user_id: str) -> Dict[str, Any]:
+        """Order count, lifetime spend and last order time of a user, from one stats document"""
+        stats_collection = await get_collection(USER_STATS_COLLECTION)
+        stats = await stats_collection.find_one({"_id": user_id}) or {}
+        
+        return {
+            "userId": user_id,
+            "orderCount": stats.get("orderCount", 0),
+            "totalSpend": stats.get("totalSpend", 0.0),
+            "lastOrderAt": stats.get("lastOrderAt")
+        }
     
     @staticmethod
     async def get_user_orders(
         user_id: str,
         limit: int = 10,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: bool = False
     ) -> Dict[str, Any]:
-        """Get orders for a specific user with pagination"""
-        try:
-            collection = await get_collection("orders")
-            
-            filter_query = {"userId": user_id}
-            
-            total_count = await collection.count_documents(filter_query)
-            
-            cursor = collection.find(filter_query).skip(offset).limit(limit).sort("_id", -1)
-            orders = await cursor.to_list(length=limit)
-            
-            formatted_orders = []
-            for order in orders:
-                try:
-                    formatted_items = []
-                    items = order.get("items", [])
-                    
-                    for item in items:
-                        # Handle different possible field structures
-                        product_id = item.get("productId") or item.get("product_id")
-                        product_name = item.get("name") or item.get("product_name", "Unknown Product")
-                        qty = item.get("qty", 1)
-                        
-                        if product_id:
-                            formatted_items.append({
-                                "productDetails": {
-                                    "name": product_name,
-                                    "id": str(product_id)
-                                },
-                                "qty": qty
-                            })
-                        else:
-                            logger.warning(f"Order {order.get('_id')} has item without productId: {item}")
-                    
-                    # Handle different possible total amount field names
-                    total_amount = order.get("totalAmount") or order.get("total", 0)
-                    
-                    formatted_orders.append({
-                        "_id": str(order["_id"]),
-                        "userId": order.get("userId", user_id),
-                        "items": formatted_items,
-                        "totalAmount": total_amount,
-                        "createdAt": order.get("createdAt"),
-                        "status": order.get("status", "created")
-                    })
-                    
-                except Exception as item_error:
-                    logger.error(f"Error processing order {order.get('_id', 'unknown')}: {item_error}")
-                    # Skip this order but continue with others
-                    continue
-            
-            next_page = (offset // limit) + 2 if offset + limit < total_count else None
+        """Get orders for a specific user with pagination.
+
+        Orders are returned newest first. When ``cursor`` is given the page
+        starts right after the order it points to and ``offset`` is ignored.
+        ``page.total`` is only computed when ``include_total`` is set.
+        """
+        collection = await get_collection("orders")
+        
+        filter_query = {"userId": user_id}
+        
+        if cursor:
+            # Seek on _id instead of skipping, so deep pages cost the same as the first
+            pipeline = [
+                {"$match": dict(filter_query, _id={"$lt": decode_cursor(cursor)})},
+                {"$sort": {"_id": -1}}
+            ]
+        else:
+            pipeline = [
+                {"$match": filter_query},
+                {"$sort": {"_id": -1}},
+                {"$skip": offset}
+            ]
+        # One extra document tells us whether another page exists
+        pipeline += [{"$limit": limit + 1}, {"$project": _ORDER_RESPONSE_PROJECTION}]
+        
+        orders = await collection.aggregate(pipeline).to_list(length=limit + 1)
+        
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        
+        if cursor:
+            next_page = None
+            previous_page = None
+        else:
+            next_page = (offset // limit) + 2 if has_more else None
             previous_page = (offset // limit) if offset > 0 else None
-            
-            page_info = {
-                "next": next_page,
-                "previous": previous_page,
-                "limit": limit,
-                "offset": offset,
-                "total": total_count
-            }
-            
-            return {
-                "data": formatted_orders,
-                "page": page_info
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting user orders for user {user_id}: {e}")
-            logger.error(f"Error details: {type(e).__name__}: {str(e)}")
-            raise
\ No newline at end of file
+        
+        total_count = None
+        if include_total:
+            stats_collection = await get_collection(USER_STATS_COLLECTION)
+            stats = await stats_collection.find_one({"_id": user_id}, {"orderCount": 1})
+            if stats is not None:
+                total_count = stats["orderCount"]
+            else:
+                # No stats document means no order since the stats existed;
+                # the first one creates it including any earlier orders
+                total_count = await collection.count_documents(filter_query)
+        
+        page_info = {
+            "next": next_page,
+            "previous": previous_page,
+            "limit": limit,
+            "offset": offset,
+            "total": total_count,
+            "next_cursor": next_cursor(orders, has_more)
+        }
+        
+        return {
+            "data": orders,
+            "page": page_info
+        }
+    
+    @staticmethod
+    async def export_user_orders(user_id: str) -> AsyncIterator[bytes]:
+        """Stream every order of a user, newest first, as NDJSON"""
+        collection = await get_collection("orders")
+        
+        cursor = collection.aggregate(
+            [
+                {"$match": {"userId": user_id}},
+                {"$sort": {"_id": -1}},
+                {"$project": _ORDER_RESPONSE_PROJECTION}
+            ],
+            batchSize=config.EXPORT_BATCH_SIZE
+        )
+        
+        async for chunk in stream_ndjson(cursor):
+            yield chunk
+    
+    @staticmethod
+    def get_write_batcher_stats() -> Optional[Dict[str, Any]]:
+        """Batch size metrics for the order write batcher, if batching is enabled"""
+        if not config.ORDER_WRITE_BATCHING:
+            return None
+        return _get_order_batcher().stats()
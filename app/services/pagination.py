@@ -0,0 +1,25 @@
+import base64
+import binascii
+import bson
+from typing import Optional
+
+
+def encode_cursor(last_id: str) -> str:
+    """Encode the ``_id`` of the last returned document as an opaque cursor"""
+    return base64.urlsafe_b64encode(bson.ObjectId(last_id).binary).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> bson.ObjectId:
+    """Decode a cursor produced by ``encode_cursor`` back into an ObjectId"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return bson.ObjectId(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, bson.errors.InvalidId, TypeError, ValueError):
+        raise ValueError("Invalid pagination cursor")
+
+
+def next_cursor(documents: list, has_more: bool) -> Optional[str]:
+    """Return the cursor for the page following ``documents``, if any"""
+    if not has_more or not documents:
+        return None
+    return encode_cursor(documents[-1]["_id"])
@@ -1,103 +1,554 @@
+import asyncio
 import bson
-from typing import List, Optional, Dict, Any
-from app.database.connection import get_collection
+import hashlib
+import json
+import time
+import uuid
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+from pydantic import ValidationError
+from app.database.connection import get_collection, utcnow
 from app.schemas.schemas import ProductCreateSchema, ProductResponseSchema
-import re
+from app.services.pagination import decode_cursor, next_cursor
+from app.services.cache import TTLCache
+from app.services.export import stream_ndjson
+from app.services.singleflight import SingleFlight
+from app.services.search import name_filter, search_fields
+from app import config
 import logging
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Totals for filtered listings and size facets, keyed by the normalized filter
+_count_cache = TTLCache(config.COUNT_CACHE_MAX_ENTRIES, config.COUNT_CACHE_TTL_SECONDS)
+
+# Pricing fields of products by string ID; name, price and the size list
+# rarely change, so order pricing is served from here instead of MongoDB.
+# Stock quantities are left out, so orders never have to invalidate it.
+_product_cache = TTLCache(config.PRODUCT_CACHE_MAX_ENTRIES, config.PRODUCT_CACHE_TTL_SECONDS)
+
+# Bumped on every catalog write; listing ETags are derived from it, so a
+# write in this process immediately changes every listing ETag
+_catalog_generation = 0
+
+# Keeps ETags from different processes (workers, serverless instances) apart,
+# since each keeps its own generation counter
+_catalog_epoch = uuid.uuid4().hex[:12]
+
+def _bump_catalog_generation() -> None:
+    global _catalog_generation
+    _catalog_generation += 1
+
+# Shares one in-flight query between identical concurrent catalog reads
+_single_flight = SingleFlight()
+
+# Derived search fields are stored on products but never returned
+_PUBLIC_PRODUCT_PROJECTION = {"name_normalized": 0, "name_ngrams": 0}
+
+# What order pricing reads, and all the product cache holds
+_PRICING_PROJECTION = {"name": 1, "price": 1, "sizes.size": 1}
+
+def _pricing_fields(product: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "_id": product["_id"],
+        "name": product["name"],
+        "price": product["price"],
+        "sizes": [{"size": entry["size"]} for entry in product["sizes"]]
+    }
+
+# Listed products in exactly the shape, types and field order of
+# ProductResponseSchema, so the FAST_JSON_RESPONSES path that skips the
+# schema produces the same body as the validated one. Every field is an
+# expression (MongoDB 4.4+), so fields come out in this order rather than
+# stored order.
+_LISTED_PRODUCT_PROJECTION = {
+    "name": "$name",
+    "price": {"$toDouble": "$price"},
+    "sizes": {
+        "$map": {
+            "input": {"$ifNull": ["$sizes", []]},
+            "in": {"size": "$$this.size", "quantity": "$$this.quantity"}
+        }
+    },
+    "createdAt": {"$ifNull": ["$createdAt", None]}
+}
+
+# Longest NDJSON line accepted by the bulk import
+_MAX_IMPORT_LINE_BYTES = 1024 * 1024
+
+def _build_product_document(product_data: ProductCreateSchema) -> Dict[str, Any]:
+    """The document stored for a validated product"""
+    product_dict = product_data.dict()
+    product_dict["createdAt"] = utcnow()
+    product_dict.update(search_fields(product_dict["name"]))
+    return product_dict
+
+async def _iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    """Split a byte stream into (line number, line) pairs without buffering the whole body.
+
+    Lines longer than _MAX_IMPORT_LINE_BYTES are yielded as None and their
+    content is discarded up to the next newline.
+    """
+    # Pieces of the line still waiting for its newline
+    parts: List[bytes] = []
+    pending_bytes = 0
+    line_number = 0
+    oversized = False
+    
+    async for chunk in chunks:
+        # Each chunk is split once; only the unfinished last line is carried over
+        *lines, partial = chunk.split(b"\n")
+        for line in lines:
+            if parts:
+                parts.append(line)
+                line = b"".join(parts)
+                parts, pending_bytes = [], 0
+            line_number += 1
+            yield line_number, (None if oversized or len(line) > _MAX_IMPORT_LINE_BYTES else line)
+            oversized = False
+        
+        if partial and not oversized:
+            parts.append(partial)
+            pending_bytes += len(partial)
+            if pending_bytes > _MAX_IMPORT_LINE_BYTES:
+                oversized = True
+                parts, pending_bytes = [], 0
+    
+    if parts or oversized:
+        yield line_number + 1, (None if oversized else b"".join(parts))
+
 class ProductService:
     
     @staticmethod
     async def create_product(product_data: ProductCreateSchema) -> Dict[str, Any]:
         """Create a new product and return full product details"""
+        collection = await get_collection("products")
+        
+        product_dict = _build_product_document(product_data)
+        
+        # insert_one adds the generated _id to product_dict, so no read back is needed
+        result = await collection.insert_one(product_dict)
+        _count_cache.clear()
+        _bump_catalog_generation()
+        
+        product_id = str(result.inserted_id)
+        public_product = {
+            field: value for field, value in product_dict.items()
+            if field not in _PUBLIC_PRODUCT_PROJECTION
+        }
+        _product_cache.set(product_id, _pricing_fields(dict(public_product, _id=product_id)))
+        
+        created_product = dict(public_product, id=product_id)
+        del created_product["_id"]
+        
+        return created_product
+    
+    @staticmethod
+    async def import_products(chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Import products from an NDJSON byte stream.
+
+        Each non-empty line is validated against ProductCreateSchema and valid
+        rows are written with unordered ``insert_many`` calls of
+        BULK_IMPORT_CHUNK_SIZE documents. At most one chunk is held in memory,
+        and the per-row error report is capped at BULK_IMPORT_MAX_ERRORS.
+        """
+        # pymongo is loaded with the first client (see connection._new_client)
+        from pymongo.errors import BulkWriteError
+        
+        collection = await get_collection("products")
+        
+        report = {"inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+        
+        def record_error(line_number: int, error: str):
+            report["failed"] += 1
+            if len(report["errors"]) < config.BULK_IMPORT_MAX_ERRORS:
+                report["errors"].append({"line": line_number, "error": error})
+            else:
+                report["errors_truncated"] = True
+        
+        async def flush(documents: List[dict], line_numbers: List[int]):
+            try:
+                result = await collection.insert_many(documents, ordered=False)
+                report["inserted"] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                report["inserted"] += e.details.get("nInserted", 0)
+                for error in write_errors:
+                    record_error(line_numbers[error["index"]], error.get("errmsg", "Write failed"))
+        
+        documents = []
+        line_numbers = []
         try:
-            collection = await get_collection("products")
-            
-            product_dict = product_data.dict()
-            product_dict["createdAt"] = datetime.utcnow()
-            
-            result = await collection.insert_one(product_dict)
-            
-            created_product = await collection.find_one({"_id": result.inserted_id})
+            async for line_number, line in _iter_ndjson_lines(chunks):
+                if line is None:
+                    record_error(line_number, f"Line exceeds {_MAX_IMPORT_LINE_BYTES} bytes")
+                    continue
+                if not line.strip():
+                    continue
+                
+                try:
+                    product_data = ProductCreateSchema(**json.loads(line))
+                except (ValueError, TypeError, ValidationError) as e:
+                    record_error(line_number, str(e))
+                    continue
+                
+                documents.append(_build_product_document(product_data))
+                line_numbers.append(line_number)
+                
+                if len(documents) >= config.BULK_IMPORT_CHUNK_SIZE:
+                    await flush(documents, line_numbers)
+                    documents, line_numbers = [], []
             
-            created_product["id"] = str(created_product["_id"])
-            del created_product["_id"]
+            if documents:
+                await flush(documents, line_numbers)
             
-            return created_product
+            return report
             
-        except Exception as e:
-            logger.error(f"Error creating product: {e}")
-            raise
+        finally:
+            if report["inserted"]:
+                _count_cache.clear()
+                _bump_catalog_generation()
     
     @staticmethod
     async def get_products(
         name: Optional[str] = None,
         size: Optional[str] = None,
         limit: int = 10,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: bool = False
     ) -> Dict[str, Any]:
-        """Get products with filtering and pagination"""
-        try:
-            collection = await get_collection("products")
-            
-            filter_query = {}
-            
-            if name:
-                filter_query["name"] = {"$regex": re.escape(name), "$options": "i"}
-            
-            if size:
-                filter_query["sizes.size"] = size
-            
-            # Get total count and products in parallel to avoid event loop issues
-            total_count = await collection.count_documents(filter_query)
-            
-            # Use find() with proper async iteration
-            cursor = collection.find(filter_query).skip(offset).limit(limit).sort("_id", 1)
-            products = []
-            
-            async for product in cursor:
-                product["_id"] = str(product["_id"])
-                products.append(product)
-            
-            next_page = (offset // limit) + 2 if offset + limit < total_count else None
+        """Get products with filtering and pagination.
+
+        When ``cursor`` is given the page starts right after the product it
+        points to (keyset pagination) and ``offset`` is ignored. ``page.total``
+        is only computed when ``include_total`` is set. Identical concurrent
+        calls share one query and receive the same result object, which
+        callers must not modify.
+        """
+        if not config.COALESCE_PRODUCT_READS:
+            return await ProductService._query_products(name, size, limit, offset, cursor, include_total)
+        
+        return await _single_flight.do(
+            ("get_products", name, size, limit, offset, cursor, include_total),
+            lambda: ProductService._query_products(name, size, limit, offset, cursor, include_total)
+        )
+    
+    @staticmethod
+    def get_listing_etag(**params) -> str:
+        """ETag for a product listing with the given query parameters.
+
+        It changes whenever this process writes to the catalog. Writes made by
+        other processes are not seen, so the ETag also rolls over every
+        RESPONSE_CACHE_TTL_SECONDS, which bounds how stale a 304 can be.
+        """
+        ttl = config.RESPONSE_CACHE_TTL_SECONDS
+        window = int(time.time() // ttl) if ttl > 0 else time.time_ns()
+        digest = hashlib.sha1(
+            repr((config.PRODUCT_SEARCH_MODE, sorted(params.items()))).encode("utf-8")
+        ).hexdigest()[:16]
+        return f'"{_catalog_epoch}-{_catalog_generation}-{window}-{digest}"'
+    
+    @staticmethod
+    async def _query_products(
+        name: Optional[str],
+        size: Optional[str],
+        limit: int,
+        offset: int,
+        cursor: Optional[str],
+        include_total: bool
+    ) -> Dict[str, Any]:
+        collection = await get_collection("products")
+        
+        filter_query = {}
+        
+        if name:
+            filter_query.update(name_filter(name))
+        
+        if size:
+            filter_query["sizes.size"] = size
+        
+        # One extra document tells us whether another page exists
+        if cursor:
+            # Seek on _id instead of skipping, so deep pages cost the same as the first
+            page_query = dict(filter_query, _id={"$gt": decode_cursor(cursor)})
+            product_cursor = collection.find(page_query, _LISTED_PRODUCT_PROJECTION).sort("_id", 1).limit(limit + 1)
+        else:
+            product_cursor = collection.find(filter_query, _LISTED_PRODUCT_PROJECTION).skip(offset).limit(limit + 1).sort("_id", 1)
+        products = []
+        
+        async for product in product_cursor:
+            product["_id"] = str(product["_id"])
+            products.append(product)
+        
+        has_more = len(products) > limit
+        products = products[:limit]
+        
+        if cursor:
+            next_page = None
+            previous_page = None
+        else:
+            next_page = (offset // limit) + 2 if has_more else None
             previous_page = (offset // limit) if offset > 0 else None
-            
-            page_info = {
-                "next": next_page,
-                "previous": previous_page,
-                "limit": limit,
-                "offset": offset,
-                "total": total_count
-            }
-            
-            return {
-                "data": products,
-                "page": page_info
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting products: {e}")
-            raise
+        
+        total_count = None
+        if include_total:
+            total_count = await ProductService._count_products(
+                collection, filter_query, name, size
+            )
+        
+        page_info = {
+            "next": next_page,
+            "previous": previous_page,
+            "limit": limit,
+            "offset": offset,
+            "total": total_count,
+            "next_cursor": next_cursor(products, has_more)
+        }
+        
+        return {
+            "data": products,
+            "page": page_info
+        }
+    
+    @staticmethod
+    async def _count_products(collection, filter_query: dict, name: Optional[str], size: Optional[str]) -> int:
+        """Count products matching a listing filter without rescanning on every request"""
+        if not filter_query:
+            # Reads collection metadata instead of scanning
+            return await collection.estimated_document_count()
+        
+        # The name filter is case-insensitive, so its case does not change the count
+        cache_key = (config.PRODUCT_SEARCH_MODE, name.lower() if name else None, size)
+        total_count = _count_cache.get(cache_key)
+        if total_count is None:
+            generation = _count_cache.generation
+            total_count = await collection.count_documents(filter_query)
+            _count_cache.set(cache_key, total_count, generation)
+        
+        return total_count
+    
+    @staticmethod
+    async def get_size_facets(name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Number of products offering each size, optionally within a name search.
+
+        The counts match what get_products returns for each ``size`` filter.
+        They are computed for every size with one aggregation and kept in the
+        count cache, which catalog writes clear, so most calls are a cache
+        lookup.
+        """
+        cache_key = ("facets", config.PRODUCT_SEARCH_MODE, name.lower() if name else None)
+        facets = _count_cache.get(cache_key)
+        if facets is None:
+            if config.COALESCE_PRODUCT_READS:
+                facets = await _single_flight.do(
+                    ("get_size_facets",) + cache_key,
+                    lambda: ProductService._aggregate_size_facets(name, cache_key)
+                )
+            else:
+                facets = await ProductService._aggregate_size_facets(name, cache_key)
+        
+        return [dict(facet) for facet in facets]
+    
+    @staticmethod
+    async def _aggregate_size_facets(name: Optional[str], cache_key: tuple) -> List[Dict[str, Any]]:
+        collection = await get_collection("products")
+        
+        pipeline = []
+        if name:
+            pipeline.append({"$match": name_filter(name)})
+        pipeline += [
+            # A product lists each size once for counting, like the size filter matches it once
+            {"$project": {"_id": 0, "size": {"$setUnion": ["$sizes.size", []]}}},
+            {"$unwind": "$size"},
+            {"$group": {"_id": "$size", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ]
+        
+        generation = _count_cache.generation
+        facets = [
+            {"size": facet["_id"], "count": facet["count"]}
+            async for facet in collection.aggregate(pipeline)
+        ]
+        _count_cache.set(cache_key, facets, generation)
+        
+        return facets
     
     @staticmethod
     async def get_product_by_id(product_id: str) -> Optional[dict]:
-        """Get a single product by ID"""
+        """Get the pricing fields of a single product by ID, served from the product cache when possible"""
+        return (await ProductService.get_products_by_ids([product_id])).get(product_id)
+    
+    @staticmethod
+    async def get_products_by_ids(product_ids: List[str]) -> Dict[str, dict]:
+        """Resolve the pricing fields of several products in at most one query, keyed by product ID.
+
+        Products come back with ``name``, ``price`` and ``sizes`` entries
+        holding only ``size``; stock quantities are not included. Cached
+        products are served from memory and the rest are fetched with a
+        single ``$in`` query and cached. With COALESCE_PRODUCT_READS,
+        concurrent calls missing the same set of products share that query.
+        IDs that are invalid or do not exist are simply absent from the
+        returned mapping.
+        """
+        products = {}
+        missing_ids = []
+        
+        for product_id in set(product_ids):
+            if not bson.ObjectId.is_valid(product_id):
+                continue
+            product = _product_cache.get(product_id)
+            if product is not None:
+                products[product_id] = dict(product)
+            else:
+                missing_ids.append(product_id)
+        
+        if not missing_ids:
+            return products
+        
+        missing_ids.sort()
+        if config.COALESCE_PRODUCT_READS:
+            # A burst of orders for products that just left the cache costs one query
+            loaded = await _single_flight.do(
+                ("load_products", tuple(missing_ids)),
+                lambda: ProductService._load_products(missing_ids)
+            )
+        else:
+            loaded = await ProductService._load_products(missing_ids)
+        
+        for product in loaded:
+            products[product["_id"]] = dict(product)
+        
+        return products
+    
+    @staticmethod
+    async def _load_products(product_ids: List[str]) -> List[dict]:
+        """Fetch the pricing fields of products with one ``$in`` query and cache them"""
+        collection = await get_collection("products")
+        
+        generation = _product_cache.generation
+        cursor = collection.find(
+            {"_id": {"$in": [bson.ObjectId(product_id) for product_id in product_ids]}},
+            _PRICING_PROJECTION
+        )
+        
+        products = []
+        async for product in cursor:
+            product["_id"] = str(product["_id"])
+            _product_cache.set(product["_id"], product, generation)
+            products.append(product)
+        
+        return products
+    
+    @staticmethod
+    async def export_products() -> AsyncIterator[bytes]:
+        """Stream the whole catalog, in _id order, as NDJSON"""
+        collection = await get_collection("products")
+        
+        cursor = collection.find({}, _PUBLIC_PRODUCT_PROJECTION).sort("_id", 1).batch_size(config.EXPORT_BATCH_SIZE)
+        
+        def format_product(product: Dict[str, Any]) -> Dict[str, Any]:
+            product["_id"] = str(product["_id"])
+            return product
+        
+        async for chunk in stream_ndjson(cursor, format_product):
+            yield chunk
+    
+    @staticmethod
+    async def reserve_stock(lines: List[Tuple[str, str, int]]) -> None:
+        """Atomically take (product ID, size, qty) lines out of stock, all or nothing.
+
+        Every line is a conditional ``$inc`` that only matches while the size
+        has enough quantity left. Each update is a single-document atomic
+        operation, so concurrent orders for the same size cannot lose updates
+        or oversell. Each line is its own command: the lines are sent
+        concurrently, but they share the client's connection pool, so with
+        the single-connection serverless client an order reserving N sizes
+        waits N round trips (one bulk_write would be one, but cannot tell
+        which lines to put back). If any line fails, the lines that
+        succeeded are put back and a ValueError naming the failed lines is
+        raised.
+
+        Stock changes leave the caches and listing ETags alone: the product
+        cache holds no quantities, and listed quantities may lag behind
+        orders by up to RESPONSE_CACHE_TTL_SECONDS, as they already do for
+        writes made by other workers.
+        """
+        if not lines:
+            return
+        
+        collection = await get_collection("products")
+        
+        # One update_one per line rather than one bulk_write: an unordered
+        # bulk only reports how many updates matched, not which, and the
+        # lines that did match are the ones to put back
+        results = await asyncio.gather(*(
+            collection.update_one(
+                {
+                    "_id": bson.ObjectId(product_id),
+                    "sizes": {"$elemMatch": {"size": size, "quantity": {"$gte": qty}}}
+                },
+                {"$inc": {"sizes.$.quantity": -qty}}
+            )
+            for product_id, size, qty in lines
+        ), return_exceptions=True)
+        
+        reserved = [
+            line for line, result in zip(lines, results)
+            if not isinstance(result, BaseException) and result.matched_count
+        ]
+        if len(reserved) == len(lines):
+            return
+        
+        await ProductService.release_stock(reserved)
+        
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # A line that failed with an error may still have been applied, so it is not put back
+            raise errors[0]
+        
+        unavailable = [
+            f"{product_id} (size {size})"
+            for (product_id, size, _), result in zip(lines, results) if not result.matched_count
+        ]
+        raise ValueError(f"Insufficient stock for {', '.join(unavailable)}")
+    
+    @staticmethod
+    async def release_stock(lines: List[Tuple[str, str, int]]) -> None:
+        """Return previously reserved (product ID, size, qty) lines to stock"""
+        if not lines:
+            return
+        
+        from pymongo import UpdateOne
+        
         try:
             collection = await get_collection("products")
             
-            if not bson.ObjectId.is_valid(product_id):
-                return None
-                
-            product = await collection.find_one({"_id": bson.ObjectId(product_id)})
-            
-            if product:
-                product["_id"] = str(product["_id"])
-            
-            return product
+            operations = [
+                UpdateOne(
+                    {"_id": bson.ObjectId(product_id)},
+                    {"$inc": {"sizes.$[line].quantity": qty}},
+                    array_filters=[{"line.size": size}]
+                )
+                for product_id, size, qty in lines
+            ]
+            await collection.bulk_write(operations, ordered=False)
             
         except Exception as e:
-            logger.error(f"Error getting product by ID: {e}")
-            raise
\ No newline at end of file
+            # Reserved stock that could not be returned stays held until fixed by hand
+            logger.error("Error releasing stock: %s", e, extra={"stock_lines": lines})
+            raise
+    
+    @staticmethod
+    def invalidate_cached_products(product_ids: List[str]) -> None:
+        """Drop products from the product cache; call after any product update"""
+        for product_id in product_ids:
+            _product_cache.invalidate(product_id)
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """Hit, miss and eviction counters for the product caches, plus read coalescing"""
+        return {
+            "products": _product_cache.stats(),
+            "counts": _count_cache.stats(),
+            "coalescing": _single_flight.stats()
+        }
@@ -0,0 +1,67 @@
+import re
+from typing import Any, Dict, List
+
+from app import config
+
+# Length of the name n-grams stored for substring search
+NGRAM_SIZE = 3
+
+
+def normalize_name(name: str) -> str:
+    """Case-folded product name as stored in ``name_normalized``"""
+    return name.strip().casefold()
+
+
+def name_ngrams(name: str) -> List[str]:
+    """N-grams stored in ``name_ngrams`` for a product name.
+
+    Besides every full-length n-gram, the shorter tails at the end of the
+    name are included, so every substring shorter than NGRAM_SIZE is the
+    prefix of at least one stored n-gram.
+    """
+    normalized = normalize_name(name)
+    return sorted({normalized[i:i + NGRAM_SIZE] for i in range(len(normalized))})
+
+
+def search_fields(name: str) -> Dict[str, Any]:
+    """Derived search fields to store alongside a product"""
+    return {
+        "name_normalized": normalize_name(name),
+        "name_ngrams": name_ngrams(name),
+    }
+
+
+def name_filter(name: str) -> Dict[str, Any]:
+    """MongoDB filter matching product names that contain ``name``.
+
+    PRODUCT_SEARCH_MODE selects the strategy: "regex" runs an unanchored
+    case-insensitive regex on ``name`` (cannot use an index bound), "prefix"
+    matches names starting with ``name`` through a range on
+    ``name_normalized``, and "ngram" matches substrings through the
+    ``name_ngrams`` multikey index.
+    """
+    mode = config.PRODUCT_SEARCH_MODE
+
+    if mode == "prefix":
+        prefix = normalize_name(name)
+        if not prefix:
+            return {}
+        upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return {"name_normalized": {"$gte": prefix, "$lt": upper_bound}}
+
+    if mode == "ngram":
+        query = normalize_name(name)
+        if not query:
+            return {}
+        if len(query) <= NGRAM_SIZE:
+            # Anchored regexes on an indexed field become index range scans
+            return {"name_ngrams": {"$regex": "^" + re.escape(query)}}
+        grams = sorted({query[i:i + NGRAM_SIZE] for i in range(len(query) - NGRAM_SIZE + 1)})
+        # The n-grams narrow candidates through the index; the regex removes
+        # names that contain every n-gram but not the whole query
+        return {
+            "name_ngrams": {"$all": grams},
+            "name_normalized": {"$regex": re.escape(query)},
+        }
+
+    return {"name": {"$regex": re.escape(name), "$options": "i"}}
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one execution.
+
+    While a call for ``key`` is in flight, further calls for the same key
+    wait for its result instead of starting their own. Every waiter receives
+    the same result object, or the same exception. A waiter being cancelled
+    only cancels the shared call once no other waiter is left.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        # Tasks belong to one event loop, so calls are only shared within it
+        call_key = (id(loop), key)
+
+        self.calls += 1
+        call = self._calls.get(call_key)
+        if call is None:
+            self.executions += 1
+            call = _Call(loop.create_task(fn()))
+            self._calls[call_key] = call
+            call.task.add_done_callback(lambda _: self._forget(call_key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every waiter was cancelled; nobody needs the result any more
+                call.task.cancel()
+                self._forget(call_key, call)
+
+    def _forget(self, call_key: Hashable, call: _Call) -> None:
+        if self._calls.get(call_key) is call:
+            del self._calls[call_key]
+
+    def stats(self) -> Dict[str, Any]:
+        coalesced = self.calls - self.executions
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": coalesced,
+            "in_flight": len(self._calls),
+            "coalescing_ratio": coalesced / self.calls if self.calls else None,
+        }
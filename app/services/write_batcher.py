@@ -0,0 +1,110 @@
+import asyncio
+import bisect
+from typing import Any, Dict, List, Tuple
+
+from app.database.connection import get_collection
+
+# Upper bounds of the batch size histogram buckets
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class WriteBatcher:
+    """Group-commits concurrent inserts into one collection.
+
+    Documents submitted within ``max_delay_ms`` of each other, up to
+    ``max_batch_size`` at a time, are written with a single unordered
+    ``insert_many``. Each caller gets back its own inserted ``_id`` or the
+    error for its own document. A batcher belongs to the event loop it is
+    first used on.
+    """
+
+    def __init__(self, collection_name: str, max_delay_ms: float, max_batch_size: int):
+        self.collection_name = collection_name
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch_size = max(max_batch_size, 1)
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer = None
+        self._flushes = set()
+        self.batches = 0
+        self.documents = 0
+        self.largest_batch = 0
+        self.batch_size_counts = [0] * (len(_BATCH_SIZE_BUCKETS) + 1)
+
+    async def insert(self, document: dict) -> Any:
+        """Queue ``document`` for the next batch and return its inserted ``_id``"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((document, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush_pending)
+
+        return await future
+
+    def _flush_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # Keep a reference so the flush task is not garbage collected mid-write
+        task = asyncio.ensure_future(self._write_batch(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write_batch(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        # The driver is loaded with the first client, not when the app is imported
+        from pymongo.errors import BulkWriteError, WriteError
+
+        self._record_batch(len(batch))
+
+        write_errors = {}
+        try:
+            collection = await get_collection(self.collection_name)
+            await collection.insert_many([document for document, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                self._fail_all(batch, e)
+                return
+            write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            self._fail_all(batch, e)
+            return
+
+        for index, (document, future) in enumerate(batch):
+            if future.done():
+                # The caller was cancelled; its document is written regardless
+                continue
+            if index in write_errors:
+                error = write_errors[index]
+                future.set_exception(WriteError(error.get("errmsg"), error.get("code"), error))
+            else:
+                future.set_result(document["_id"])
+
+    @staticmethod
+    def _fail_all(batch: List[Tuple[dict, asyncio.Future]], error: Exception) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _record_batch(self, size: int) -> None:
+        self.batches += 1
+        self.documents += size
+        self.largest_batch = max(self.largest_batch, size)
+        self.batch_size_counts[bisect.bisect_left(_BATCH_SIZE_BUCKETS, size)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in _BATCH_SIZE_BUCKETS] + [f">{_BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            "batches": self.batches,
+            "documents": self.documents,
+            "avg_batch_size": self.documents / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": len(self._pending),
+            "batch_sizes": dict(zip(labels, self.batch_size_counts)),
+        }
@@ -0,0 +1,52 @@
+"""Minimal in-process ASGI client, so the app can be driven without a server or httpx."""
+from typing import Dict, Optional, Sequence, Tuple
+
+
+async def request(
+    app,
+    method: str,
+    path: str,
+    query: str = "",
+    body: bytes = b"",
+    headers: Sequence[Tuple[str, str]] = ()
+) -> Tuple[int, Dict[str, str], bytes]:
+    """Send one HTTP request to ``app`` and return (status, headers, body)"""
+    request_sent = False
+    messages = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    request_headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    if body:
+        request_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "root_path": "",
+        "query_string": query.encode("utf-8"),
+        "headers": request_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    await app(scope, receive, send)
+
+    start = next(message for message in messages if message["type"] == "http.response.start")
+    response_headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in start["headers"]}
+    response_body = b"".join(
+        message.get("body", b"") for message in messages if message["type"] == "http.response.body"
+    )
+    return start["status"], response_headers, response_body
@@ -0,0 +1,101 @@
+"""Microbenchmark list response serialization: FastAPI default vs orjson fast path.
+
+Serializes synthetic 100-item pages shaped like the output of
+ProductService.get_products and OrderService.get_user_orders. No database
+is needed.
+
+Usage:
+    python -m benchmarks.bench_json_responses
+"""
+import argparse
+import timeit
+from datetime import datetime
+
+import bson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from app.serialization import FastJSONResponse
+from main import app
+
+
+def product_page(size: int) -> dict:
+    return {
+        "data": [
+            {
+                "_id": str(bson.ObjectId()),
+                "name": f"Product {i}",
+                "price": 19.99 + i,
+                "sizes": [{"size": s, "quantity": 10} for s in ("S", "M", "L")],
+                "createdAt": datetime.utcnow(),
+            }
+            for i in range(size)
+        ],
+        "page": {"next": 2, "previous": None, "limit": size, "offset": 0, "total": None, "next_cursor": None},
+    }
+
+
+def order_page(size: int) -> dict:
+    return {
+        "data": [
+            {
+                "_id": str(bson.ObjectId()),
+                "userId": "user_1",
+                "items": [
+                    {"productDetails": {"name": f"Product {j}", "id": str(bson.ObjectId())}, "qty": 1}
+                    for j in range(3)
+                ],
+                "totalAmount": 59.97,
+                "createdAt": datetime.utcnow(),
+                "status": "created",
+            }
+            for _ in range(size)
+        ],
+        "page": {"next": 2, "previous": None, "limit": size, "offset": 0, "total": None, "next_cursor": None},
+    }
+
+
+def response_field(path: str):
+    for route in app.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+async def default_path(field, content):
+    # What FastAPI does for a dict returned from a route with a response_model
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+def fast_path(content):
+    return FastJSONResponse(content).body
+
+
+def main(page_size: int, number: int):
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    cases = [
+        ("GET /products/", "/products/", product_page(page_size)),
+        ("GET /orders/{user_id}", "/orders/{user_id}", order_page(page_size)),
+    ]
+
+    print(f"{'endpoint':<24} {'default us':>12} {'orjson us':>12} {'speedup':>9}")
+    for label, path, content in cases:
+        field = response_field(path)
+        default = min(timeit.repeat(
+            lambda: loop.run_until_complete(default_path(field, content)), number=number, repeat=5
+        )) / number * 1e6
+        fast = min(timeit.repeat(lambda: fast_path(content), number=number, repeat=5)) / number * 1e6
+        print(f"{label:<24} {default:>12.1f} {fast:>12.1f} {default / fast:>8.1f}x")
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    main(args.page_size, args.number)
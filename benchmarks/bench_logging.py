@@ -0,0 +1,130 @@
+"""Benchmark the cost of request logging on the event loop thread.
+
+Two measurements, each with log output going to a temporary file:
+
+1. Per-request logging calls in isolation: the previous pattern (two
+   f-string info logs per request through a synchronous StreamHandler)
+   against one lazily formatted info log through the background queue of
+   app/logging_config.py, with and without 1% sampling.
+2. End to end: sequential GET /orders/{user_id} requests through the app
+   (in-memory MongoDB stand-in, no simulated latency), so the time per
+   request is event-loop time, with the same handler setups.
+
+Usage:
+    python -m benchmarks.bench_logging --iterations 50000 --requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault("DATABASE_NAME", "ecommerce_bench")
+
+from app import config, logging_config
+from benchmarks.asgi_client import request
+from benchmarks.fake_mongo import use_fake_database
+
+_ROUTE = "/orders/{user_id}"
+
+
+@contextmanager
+def synchronous_logging(path: str):
+    """The setup the app had before: a StreamHandler written from the calling thread"""
+    handler = logging.StreamHandler(open(path, "a"))
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
+        handler.stream.close()
+
+
+@contextmanager
+def queued_logging(path: str, sample_rate: float):
+    config.LOG_SAMPLE_RATES = f"{_ROUTE}={sample_rate}"
+    stderr = sys.stderr
+    sys.stderr = open(path, "a")
+    try:
+        # The listener's StreamHandler picks up the redirected stderr
+        logging_config.configure_logging()
+        yield
+    finally:
+        logging_config.stop_logging()
+        sys.stderr.close()
+        sys.stderr = stderr
+
+
+def setups(path: str):
+    return [
+        ("sync handler, f-strings", lambda: synchronous_logging(path), True),
+        ("queue, lazy", lambda: queued_logging(path, 1.0), False),
+        ("queue, lazy, 1% sampled", lambda: queued_logging(path, 0.01), False),
+    ]
+
+
+def time_calls(legacy: bool, iterations: int) -> float:
+    """Microseconds of logging per request"""
+    logger = logging.getLogger("app.routes.orders")
+    user_id, limit, offset, data = "user_123", 10, 0, list(range(10))
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if legacy:
+            logger.info(f"Fetching orders for user: {user_id}, limit: {limit}, offset: {offset}")
+            logger.info(f"Successfully retrieved {len(data)} orders for user {user_id}")
+        else:
+            logger.info(
+                "Retrieved %d orders", len(data),
+                extra={"route": _ROUTE, "user_id": user_id, "limit": limit, "offset": offset}
+            )
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def time_requests(app, requests: int, legacy: bool) -> float:
+    """Microseconds per GET /orders/{user_id} request"""
+    logger = logging.getLogger("app.routes.orders")
+    start = time.perf_counter()
+    for _ in range(requests):
+        if legacy:
+            # The route no longer logs before the call; add back what it used to
+            logger.info(f"Fetching orders for user: bench_user, limit: 10, offset: 0")
+        status, _, _ = await request(app, "GET", "/orders/bench_user", "limit=10")
+        assert status == 200
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(args):
+    database = use_fake_database()
+    from main import app
+    # main configures logging on import; every setup below installs its own
+    logging_config.stop_logging()
+
+    await database["orders"].insert_many([
+        {"userId": "bench_user", "items": [], "totalAmount": 1.0, "status": "created"} for _ in range(50)
+    ])
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.log")
+        print(f"{'setup':<26} {'calls us/request':>17} {'app us/request':>15}")
+        for label, setup, legacy in setups(path):
+            with setup():
+                calls = time_calls(legacy, args.iterations)
+                await time_requests(app, min(args.requests, 200), legacy)  # warm up
+                per_request = await time_requests(app, args.requests, legacy)
+            print(f"{label:<26} {calls:>17.2f} {per_request:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50000, help="Logging calls timed in isolation")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests timed end to end")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
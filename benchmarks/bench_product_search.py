@@ -0,0 +1,95 @@
+"""Benchmark product name search modes on a large synthetic catalog.
+
+Seeds a throwaway database (DATABASE_NAME, default ``ecommerce_bench``) on
+the MongoDB instance configured by MONGODB_URL, creates the registered
+indexes, then times GET /products name searches through
+ProductService.get_products in each PRODUCT_SEARCH_MODE. The database is
+dropped when the run finishes.
+
+Usage:
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_product_search --products 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_NAME", "ecommerce_bench")
+
+from app import config
+from app.database.connection import get_database, close_mongo_connection
+from app.database.indexes import ensure_indexes
+from app.schemas.schemas import ProductCreateSchema
+from app.services.product_service import ProductService, _build_product_document
+
+_WORDS = [
+    "classic", "slim", "cotton", "linen", "denim", "shirt", "jacket", "hoodie",
+    "sneaker", "trouser", "summer", "winter", "striped", "vintage", "sport", "wool",
+]
+
+# (label, query, modes it is a valid search for)
+_QUERIES = [
+    ("prefix", "Classic Sh", ("regex", "prefix", "ngram")),
+    ("substring", "denim jack", ("regex", "ngram")),
+    ("short substring", "ool", ("regex", "ngram")),
+]
+
+
+async def seed_catalog(count: int, chunk_size: int = 5000):
+    database = await get_database()
+    collection = database["products"]
+    rng = random.Random(42)
+
+    documents = []
+    for i in range(count):
+        name = " ".join(rng.choice(_WORDS).title() for _ in range(3)) + f" {i}"
+        documents.append(_build_product_document(ProductCreateSchema(
+            name=name,
+            price=round(rng.uniform(5, 200), 2),
+            sizes=[{"size": "M", "quantity": 10}]
+        )))
+        if len(documents) >= chunk_size:
+            await collection.insert_many(documents, ordered=False)
+            documents = []
+    if documents:
+        await collection.insert_many(documents, ordered=False)
+
+    await ensure_indexes(database)
+
+
+async def time_search(query: str, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await ProductService.get_products(name=query, limit=10)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)
+
+
+async def main(products: int, iterations: int):
+    config.COALESCE_PRODUCT_READS = False
+    try:
+        await seed_catalog(products)
+
+        print(f"{'query':<18} {'mode':<8} {'p50 ms':>10} {'p95 ms':>10}")
+        for label, query, modes in _QUERIES:
+            for mode in modes:
+                config.PRODUCT_SEARCH_MODE = mode
+                samples = await time_search(query, iterations)
+                p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+                print(f"{label:<18} {mode:<8} {statistics.median(samples):>10.2f} {p95:>10.2f}")
+    finally:
+        database = await get_database()
+        await database.client.drop_database(database.name)
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.products, args.iterations))
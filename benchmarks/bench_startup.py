@@ -0,0 +1,135 @@
+"""Cold-start benchmark: import time and time-to-first-response of main.app.
+
+Each sample runs in a fresh interpreter, the way a serverless instance
+starts. It measures how long ``import main`` takes, then runs the app's
+startup (lifespan) and sends a first GET /products/ through ASGI, and reports
+the time from the start of the import to that first response.
+
+With the default in-memory backend (benchmarks/fake_mongo.py) no server is
+contacted. The MongoDB driver import is timed on its own and added to the
+first-response time, because the stand-in loads it before the request would.
+With ``--backend mongodb`` the real client is created, connected and
+queried against MONGODB_URL, so connection setup is included as well.
+
+Exits with status 1 if a median exceeds its ``--max-*`` threshold, or
+regresses by more than ``--tolerance`` against a ``--compare`` file.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+    python -m benchmarks.bench_startup --compare startup.json
+    python -m benchmarks.bench_startup --max-import-ms 1500 --max-first-response-ms 2000
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_startup --backend mongodb
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in the fresh interpreter; argv[1] is the backend
+_CHILD = r"""
+import sys, time
+start = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - start) * 1000
+
+import asyncio
+import json
+
+driver_ms = 0.0
+if sys.argv[1] == "memory":
+    driver_start = time.perf_counter()
+    import motor.motor_asyncio, app.database.monitoring
+    driver_ms = (time.perf_counter() - driver_start) * 1000
+    from benchmarks.fake_mongo import use_fake_database
+    use_fake_database()
+
+from benchmarks.asgi_client import request
+
+async def first_response():
+    request_start = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        status, _, _ = await request(main.app, "GET", "/products/", "limit=10")
+        request_ms = (time.perf_counter() - request_start) * 1000
+    return status, request_ms
+
+status, request_ms = asyncio.run(first_response())
+print(json.dumps({
+    "status": status,
+    "import_ms": import_ms,
+    "driver_import_ms": driver_ms,
+    "first_response_ms": import_ms + driver_ms + request_ms,
+}))
+"""
+
+_METRICS = ("import_ms", "driver_import_ms", "first_response_ms")
+
+
+def sample(backend: str) -> dict:
+    env = dict(os.environ, DATABASE_NAME=os.environ.get("DATABASE_NAME", "ecommerce_bench"))
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD, backend],
+        capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup sample failed:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if result["status"] >= 400:
+        raise RuntimeError(f"First request failed with status {result['status']}:\n{completed.stderr}")
+    return result
+
+
+def main(args) -> bool:
+    # One throwaway run so bytecode compilation is not counted
+    sample(args.backend)
+    samples = [sample(args.backend) for _ in range(args.runs)]
+
+    medians = {metric: statistics.median(s[metric] for s in samples) for metric in _METRICS}
+    report = {"backend": args.backend, "runs": args.runs, "medians": medians}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["medians"]
+
+    passed = True
+    print(f"{'metric':<20} {'median ms':>10} {'min ms':>10} {'max ms':>10}" + (f" {'change':>8}" if baseline else ""))
+    for metric in _METRICS:
+        values = [s[metric] for s in samples]
+        line = f"{metric:<20} {medians[metric]:>10.1f} {min(values):>10.1f} {max(values):>10.1f}"
+        if baseline and baseline.get(metric):
+            change = (medians[metric] - baseline[metric]) / baseline[metric]
+            line += f" {change * 100:>+7.1f}%"
+            if metric != "driver_import_ms" and change > args.tolerance:
+                line += "  REGRESSION"
+                passed = False
+        print(line)
+
+    for metric, limit in (("import_ms", args.max_import_ms), ("first_response_ms", args.max_first_response_ms)):
+        if limit is not None and medians[metric] > limit:
+            print(f"{metric} median {medians[metric]:.1f} ms exceeds the {limit:.1f} ms limit")
+            passed = False
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("memory", "mongodb"), default="memory")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to sample")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-first-response-ms", type=float,
+                        help="Fail if the median time to first response exceeds this")
+    parser.add_argument("--compare", help="Previous --output file to compare medians with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Largest allowed slowdown against --compare, as a fraction")
+    parser.add_argument("--output", help="Write the medians to this JSON file")
+    args = parser.parse_args()
+
+    sys.exit(0 if main(args) else 1)
@@ -0,0 +1,654 @@
+"""In-memory stand-in for the subset of Motor the services use.
+
+Only the query operators and aggregation stages the services issue are
+implemented. Every call yields to the event loop and can add a fixed
+simulated round-trip latency, so the number of round trips a code path
+makes shows up in the measurements.
+"""
+import asyncio
+import copy
+import re
+from typing import Any, Dict, List, Optional
+
+import bson
+from pymongo import InsertOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+_MISSING = object()
+
+
+def _get_path(document: Any, path: str) -> List[Any]:
+    """All values at a dotted path, descending into arrays like MongoDB does"""
+    values = [document]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    next_values.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    next_values.append(value[int(part)])
+                else:
+                    for element in value:
+                        if isinstance(element, dict) and part in element:
+                            next_values.append(element[part])
+        values = next_values
+    return values
+
+
+def _candidates(values: List[Any]) -> List[Any]:
+    """Values a query operator is compared with: each value and each array element"""
+    result = []
+    for value in values:
+        result.append(value)
+        if isinstance(value, list):
+            result.extend(value)
+    return result
+
+
+def _compare(left: Any, right: Any, op: str) -> bool:
+    try:
+        if op == "$gt":
+            return left > right
+        if op == "$gte":
+            return left >= right
+        if op == "$lt":
+            return left < right
+        return left <= right
+    except TypeError:
+        return False
+
+
+def _match_condition(values: List[Any], condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for op, argument in condition.items():
+            if op == "$options":
+                continue
+            if op == "$exists":
+                if bool(values) != bool(argument):
+                    return False
+            elif op == "$in":
+                if not any(candidate in argument for candidate in _candidates(values)):
+                    return False
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if not any(_compare(candidate, argument, op) for candidate in _candidates(values)):
+                    return False
+            elif op == "$regex":
+                flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                pattern = re.compile(argument, flags)
+                if not any(isinstance(c, str) and pattern.search(c) for c in _candidates(values)):
+                    return False
+            elif op == "$all":
+                candidates = _candidates(values)
+                if not all(item in candidates for item in argument):
+                    return False
+            elif op == "$elemMatch":
+                elements = [e for v in values if isinstance(v, list) for e in v]
+                if not any(isinstance(e, dict) and matches(e, argument) for e in elements):
+                    return False
+            elif op == "$ne":
+                if argument in _candidates(values):
+                    return False
+            elif op == "$not":
+                if _match_condition(values, argument):
+                    return False
+            else:
+                raise NotImplementedError(f"Query operator {op} is not supported by the fake")
+        return True
+
+    return condition in _candidates(values) or (condition is None and not values)
+
+
+def matches(document: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif not _match_condition(_get_path(document, key), condition):
+            return False
+    return True
+
+
+def _include_path(source: dict, target: dict, parts: List[str]) -> None:
+    """Copy a (dotted) inclusion path from source into target, through arrays"""
+    key, rest = parts[0], parts[1:]
+    if key not in source:
+        return
+    value = source[key]
+    if not rest:
+        target[key] = copy.deepcopy(value)
+    elif isinstance(value, list):
+        elements = target.setdefault(key, [{} for element in value if isinstance(element, dict)])
+        for element, projected in zip((e for e in value if isinstance(e, dict)), elements):
+            _include_path(element, projected, rest)
+    elif isinstance(value, dict):
+        _include_path(value, target.setdefault(key, {}), rest)
+
+
+def _project(document: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+    if any(not isinstance(value, (int, bool)) for value in projection.values()):
+        # Aggregation expressions in a find projection
+        return copy.deepcopy(_project_stage(document, projection))
+    includes = {key for key, value in projection.items() if value and key != "_id"}
+    if includes:
+        result = {}
+        for key in includes:
+            _include_path(document, result, key.split("."))
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {key: copy.deepcopy(value) for key, value in document.items() if projection.get(key, 1)}
+
+
+def _sort_documents(documents: List[dict], sort: List[tuple]) -> List[dict]:
+    if len(sort) == 1 and sort[0][0] == "_id" and all(isinstance(d.get("_id"), bson.ObjectId) for d in documents):
+        # Documents are kept in insertion order, which is _id order for
+        # generated ObjectIds, so the common _id sort needs no work
+        return documents[::-1] if sort[0][1] < 0 else documents
+    for key, direction in reversed(sort):
+        documents.sort(key=lambda document: _sort_key(document, key), reverse=direction < 0)
+    return documents
+
+
+def _sort_key(document: dict, key: str) -> tuple:
+    values = _get_path(document, key)
+    return (1, values[0]) if values else (0,)
+
+
+def _field_value(value: Any, parts: List[str]) -> Any:
+    """A field path in an expression; paths through arrays yield arrays, as in MongoDB"""
+    for index, part in enumerate(parts):
+        if isinstance(value, list):
+            values = [_field_value(element, parts[index:]) for element in value if isinstance(element, dict)]
+            return [v for v in values if v is not _MISSING]
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _evaluate(expression: Any, document: dict, variables: Dict[str, Any]) -> Any:
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, _, path = expression[2:].partition(".")
+        value = variables.get(name, _MISSING)
+        if path and value is not _MISSING:
+            found = _get_path(value, path)
+            value = found[0] if found else _MISSING
+        return value
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _field_value(document, expression[1:].split("."))
+    if isinstance(expression, list):
+        return [_evaluate(item, document, variables) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            op, argument = next(iter(expression.items()))
+            if op.startswith("$"):
+                return _evaluate_operator(op, argument, document, variables)
+        result = {}
+        for key, value in expression.items():
+            evaluated = _evaluate(value, document, variables)
+            if evaluated is not _MISSING:
+                result[key] = evaluated
+        return result
+    return expression
+
+
+def _evaluate_operator(op: str, argument: Any, document: dict, variables: Dict[str, Any]) -> Any:
+    if op == "$literal":
+        return argument
+    if op == "$toString":
+        value = _evaluate(argument, document, variables)
+        return None if value in (_MISSING, None) else str(value)
+    if op == "$toDouble":
+        value = _evaluate(argument, document, variables)
+        return None if value in (_MISSING, None) else float(value)
+    if op == "$ifNull":
+        for item in argument:
+            value = _evaluate(item, document, variables)
+            if value not in (_MISSING, None):
+                return value
+        return None
+    if op in ("$map", "$filter"):
+        items = _evaluate(argument["input"], document, variables)
+        if items in (_MISSING, None):
+            return None
+        name = argument.get("as", "this")
+        result = []
+        for item in items:
+            scope = dict(variables, **{name: item})
+            if op == "$map":
+                result.append(_evaluate(argument["in"], document, scope))
+            elif _evaluate(argument["cond"], document, scope) not in (_MISSING, None, False, 0):
+                result.append(item)
+        return result
+    if op == "$mergeObjects":
+        merged = {}
+        for item in argument:
+            value = _evaluate(item, document, variables)
+            if isinstance(value, dict):
+                merged.update(value)
+        return merged
+    if op == "$setUnion":
+        result = []
+        for item in argument:
+            value = _evaluate(item, document, variables)
+            for element in value if isinstance(value, list) else []:
+                if element not in result:
+                    result.append(element)
+        return result
+    if op == "$size":
+        value = _evaluate(argument, document, variables)
+        return len(value) if isinstance(value, list) else 0
+    if op == "$sum":
+        if isinstance(argument, list):
+            return sum(v for v in (_evaluate(a, document, variables) for a in argument) if isinstance(v, (int, float)))
+        value = _evaluate(argument, document, variables)
+        return value if isinstance(value, (int, float)) else 0
+    raise NotImplementedError(f"Expression operator {op} is not supported by the fake")
+
+
+def _project_stage(document: dict, specification: dict) -> dict:
+    result = {}
+    if specification.get("_id", 1) == 1 and "_id" in document:
+        result["_id"] = document["_id"]
+    for key, value in specification.items():
+        if value == 1 or value is True:
+            if key in document:
+                result[key] = document[key]
+        elif value == 0 or value is False:
+            result.pop(key, None)
+        else:
+            evaluated = _evaluate(value, document, {"ROOT": document})
+            if evaluated is not _MISSING:
+                result[key] = evaluated
+    return result
+
+
+def _run_pipeline(documents: List[dict], pipeline: List[dict]) -> List[dict]:
+    for stage in pipeline:
+        (name, specification), = stage.items()
+        if name == "$match":
+            documents = [document for document in documents if matches(document, specification)]
+        elif name == "$sort":
+            documents = _sort_documents(documents, list(specification.items()))
+        elif name == "$skip":
+            documents = documents[specification:]
+        elif name == "$limit":
+            documents = documents[:specification]
+        elif name == "$project":
+            documents = [_project_stage(document, specification) for document in documents]
+        elif name == "$unwind":
+            path = specification if isinstance(specification, str) else specification["path"]
+            field = path[1:]
+            unwound = []
+            for document in documents:
+                for value in (_get_path(document, field) or [[]])[0] or []:
+                    unwound.append(dict(copy.deepcopy(document), **{field: value}))
+            documents = unwound
+        elif name == "$group":
+            documents = _group(documents, specification)
+        else:
+            raise NotImplementedError(f"Aggregation stage {name} is not supported by the fake")
+    return documents
+
+
+def _group(documents: List[dict], specification: dict) -> List[dict]:
+    groups: Dict[Any, dict] = {}
+    for document in documents:
+        key = _evaluate(specification["_id"], document, {"ROOT": document})
+        hashable = repr(key)
+        group = groups.setdefault(hashable, {"_id": key})
+        for field, accumulator in specification.items():
+            if field == "_id":
+                continue
+            (op, argument), = accumulator.items()
+            value = _evaluate(argument, document, {"ROOT": document})
+            if op == "$sum":
+                group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$max":
+                if value is not _MISSING and (field not in group or value > group[field]):
+                    group[field] = value
+            elif op == "$addToSet":
+                group.setdefault(field, [])
+                if value not in group[field]:
+                    group[field].append(value)
+            else:
+                raise NotImplementedError(f"Accumulator {op} is not supported by the fake")
+    return list(groups.values())
+
+
+def _positional_index(array: list, field: str, query: dict) -> int:
+    """Index of the array element the query matched, for the ``$`` update operator"""
+    for key, condition in query.items():
+        if key == field and isinstance(condition, dict) and "$elemMatch" in condition:
+            for index, element in enumerate(array):
+                if isinstance(element, dict) and matches(element, condition["$elemMatch"]):
+                    return index
+        elif key.startswith(field + "."):
+            subquery = {key[len(field) + 1:]: condition}
+            for index, element in enumerate(array):
+                if isinstance(element, dict) and matches(element, subquery):
+                    return index
+    raise WriteError("The positional operator did not find the match needed from the query.", 2)
+
+
+def _array_filter_matches(element: Any, identifier: str, array_filters: List[dict]) -> bool:
+    for array_filter in array_filters:
+        for key, condition in array_filter.items():
+            name, _, rest = key.partition(".")
+            if name != identifier:
+                continue
+            if rest:
+                if not (isinstance(element, dict) and matches(element, {rest: condition})):
+                    return False
+            elif not _match_condition([element], condition):
+                return False
+    return True
+
+
+def _update_targets(container: Any, parts: List[str], field: str, query: dict, array_filters: List[dict]) -> List[tuple]:
+    """(container, key) pairs an update path refers to, resolving ``$`` and ``$[name]``"""
+    part = parts[0]
+    if isinstance(container, list):
+        if part == "$":
+            keys = [_positional_index(container, field, query)]
+        elif part.startswith("$[") and part.endswith("]"):
+            identifier = part[2:-1]
+            keys = [i for i, element in enumerate(container) if _array_filter_matches(element, identifier, array_filters)]
+        else:
+            keys = [int(part)]
+        path = field
+    else:
+        keys = [part]
+        path = f"{field}.{part}" if field else part
+
+    if len(parts) == 1:
+        return [(container, key) for key in keys]
+    targets = []
+    for key in keys:
+        if isinstance(container, dict) and key not in container:
+            container[key] = {}
+        targets.extend(_update_targets(container[key], parts[1:], path, query, array_filters))
+    return targets
+
+
+def _apply_update(document: dict, update: dict, query: dict, array_filters: List[dict], inserting: bool) -> None:
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, argument in fields.items():
+            for container, key in _update_targets(document, path.split("."), "", query, array_filters):
+                exists = key in container if isinstance(container, dict) else key < len(container)
+                if op in ("$set", "$setOnInsert"):
+                    container[key] = copy.deepcopy(argument)
+                elif op == "$inc":
+                    container[key] = (container[key] if exists else 0) + argument
+                elif op == "$max":
+                    if not exists or argument > container[key]:
+                        container[key] = argument
+                elif op == "$min":
+                    if not exists or argument < container[key]:
+                        container[key] = argument
+                else:
+                    raise NotImplementedError(f"Update operator {op} is not supported by the fake")
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", query: dict, projection: Optional[dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key, direction=None):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction or 1)]
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, count: int):
+        return self
+
+    def _evaluate(self) -> List[dict]:
+        documents = [d for d in self._collection.documents.values() if matches(d, self._query)]
+        documents = _sort_documents(documents, self._sort)[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [_project(document, self._projection) for document in documents]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        await self._collection.database.round_trip()
+        documents = self._evaluate()
+        return documents[:length] if length else documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection.database.round_trip()
+        for document in self._evaluate():
+            yield document
+
+    async def explain(self) -> dict:
+        return {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}
+
+
+class FakeAggregationCursor(FakeCursor):
+    def __init__(self, collection: "FakeCollection", pipeline: List[dict]):
+        super().__init__(collection, {}, None)
+        self._pipeline = pipeline
+
+    def _evaluate(self) -> List[dict]:
+        pipeline = self._pipeline
+        documents = list(self._collection.documents.values())
+        if pipeline and "$match" in pipeline[0]:
+            # Filter before copying, like an index would narrow the scan
+            documents = [document for document in documents if matches(document, pipeline[0]["$match"])]
+            pipeline = pipeline[1:]
+        output = None
+        if pipeline and "$out" in pipeline[-1]:
+            output, pipeline = pipeline[-1]["$out"], pipeline[:-1]
+        documents = _run_pipeline([copy.deepcopy(document) for document in documents], pipeline)
+        if output is None:
+            return documents
+        # $out replaces the target collection and returns nothing
+        target = self._collection.database[output]
+        target.documents = {document["_id"]: document for document in documents}
+        return []
+
+
+class FakeCollection:
+    def __init__(self, database: "FakeDatabase", name: str):
+        self.database = database
+        self.name = name
+        # Insertion order equals _id order, since ObjectIds increase
+        self.documents: Dict[Any, dict] = {}
+
+    def _insert(self, document: dict) -> Any:
+        document.setdefault("_id", bson.ObjectId())
+        if document["_id"] in self.documents:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}", 11000)
+        self.documents[document["_id"]] = copy.deepcopy(document)
+        return document["_id"]
+
+    async def insert_one(self, document: dict, **kwargs):
+        await self.database.round_trip()
+        return _Result(inserted_id=self._insert(document), acknowledged=True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True, **kwargs):
+        await self.database.round_trip()
+        inserted_ids = []
+        write_errors = []
+        for index, document in enumerate(documents):
+            try:
+                inserted_ids.append(self._insert(document))
+            except DuplicateKeyError as e:
+                write_errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError({
+                "writeErrors": write_errors,
+                "writeConcernErrors": [],
+                "nInserted": len(inserted_ids),
+            })
+        return _Result(inserted_ids=inserted_ids, acknowledged=True)
+
+    def _update(self, query: dict, update: dict, upsert: bool, array_filters: Optional[List[dict]], multi: bool) -> dict:
+        """Apply one update in place; returns the counts a server reply carries"""
+        array_filters = array_filters or []
+        matched = [document for document in self.documents.values() if matches(document, query)]
+        if not multi:
+            matched = matched[:1]
+
+        if not matched:
+            if not upsert:
+                return {"n": 0, "nModified": 0, "upserted": None}
+            document = {
+                key: copy.deepcopy(value) for key, value in query.items()
+                if not key.startswith("$") and "." not in key
+                and not (isinstance(value, dict) and any(k.startswith("$") for k in value))
+            }
+            _apply_update(document, update, query, array_filters, inserting=True)
+            return {"n": 0, "nModified": 0, "upserted": self._insert(document)}
+
+        for document in matched:
+            # Updates are applied to a copy so a failing operator leaves the document untouched
+            updated = copy.deepcopy(document)
+            _apply_update(updated, update, query, array_filters, inserting=False)
+            self.documents[document["_id"]] = updated
+        return {"n": len(matched), "nModified": len(matched), "upserted": None}
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False, array_filters=None, **kwargs):
+        await self.database.round_trip()
+        result = self._update(query, update, upsert, array_filters, multi=False)
+        return _Result(matched_count=result["n"], modified_count=result["nModified"],
+                       upserted_id=result["upserted"], acknowledged=True)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False, array_filters=None, **kwargs):
+        await self.database.round_trip()
+        result = self._update(query, update, upsert, array_filters, multi=True)
+        return _Result(matched_count=result["n"], modified_count=result["nModified"],
+                       upserted_id=result["upserted"], acknowledged=True)
+
+    async def bulk_write(self, requests: list, ordered: bool = True, **kwargs):
+        await self.database.round_trip()
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nUpserted": 0}
+        upserted_ids = {}
+        write_errors = []
+        for index, operation in enumerate(requests):
+            try:
+                if isinstance(operation, InsertOne):
+                    self._insert(operation._doc)
+                    counts["nInserted"] += 1
+                elif isinstance(operation, (UpdateOne, UpdateMany)):
+                    result = self._update(
+                        operation._filter, operation._doc, operation._upsert,
+                        operation._array_filters, multi=isinstance(operation, UpdateMany)
+                    )
+                    counts["nMatched"] += result["n"]
+                    counts["nModified"] += result["nModified"]
+                    if result["upserted"] is not None:
+                        counts["nUpserted"] += 1
+                        upserted_ids[index] = result["upserted"]
+                else:
+                    raise NotImplementedError(f"Bulk operation {type(operation).__name__} is not supported by the fake")
+            except WriteError as e:
+                write_errors.append({"index": index, "code": e.code, "errmsg": str(e), "op": operation})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError(dict(counts, writeErrors=write_errors, writeConcernErrors=[],
+                                      upserted=[{"index": i, "_id": _id} for i, _id in upserted_ids.items()]))
+        return _Result(inserted_count=counts["nInserted"], matched_count=counts["nMatched"],
+                       modified_count=counts["nModified"], upserted_count=counts["nUpserted"],
+                       upserted_ids=upserted_ids, acknowledged=True)
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> FakeCursor:
+        return FakeCursor(self, query or {}, projection)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        documents = await self.find(query, projection).limit(1).to_list(1)
+        return documents[0] if documents else None
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> FakeAggregationCursor:
+        return FakeAggregationCursor(self, pipeline)
+
+    async def count_documents(self, query: dict, **kwargs) -> int:
+        await self.database.round_trip()
+        return sum(1 for document in self.documents.values() if matches(document, query))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        await self.database.round_trip()
+        return len(self.documents)
+
+    async def create_indexes(self, indexes, **kwargs) -> List[str]:
+        await self.database.round_trip()
+        return [index.document["name"] for index in indexes]
+
+
+class FakeClient:
+    def __init__(self, database: "FakeDatabase"):
+        self._database = database
+
+    async def drop_database(self, name: str):
+        self._database.collections.clear()
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self, name: str = "ecommerce_bench", round_trip_ms: float = 0.0):
+        self.name = name
+        self.round_trip_seconds = round_trip_ms / 1000
+        self.round_trips = 0
+        self.collections: Dict[str, FakeCollection] = {}
+        self.client = FakeClient(self)
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self, name)
+        return self.collections[name]
+
+    async def command(self, command: str, **kwargs) -> dict:
+        await self.round_trip()
+        return {"ok": 1.0}
+
+    async def round_trip(self):
+        """Simulate one network round trip to the server"""
+        self.round_trips += 1
+        await asyncio.sleep(self.round_trip_seconds)
+
+
+def use_fake_database(round_trip_ms: float = 0.0) -> FakeDatabase:
+    """Point the app's get_database at a fresh FakeDatabase and return it"""
+    from app.database import connection
+
+    fake_database = FakeDatabase(round_trip_ms=round_trip_ms)
+
+    async def get_database():
+        return fake_database
+
+    connection.get_database = get_database
+    return fake_database
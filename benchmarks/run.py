@@ -0,0 +1,289 @@
+"""Reproducible load-test suite for the API, driven in-process.
+
+Seeds a catalog and order histories of configurable size, then drives the
+FastAPI app through ASGI (no HTTP server) and reports throughput and
+p50/p95/p99 latency for:
+
+- create_order by cart size
+- get_products by filter and offset, and the size facets
+- get_user_orders and the order summary by history depth
+
+The backend is either an in-memory MongoDB stand-in (benchmarks/fake_mongo.py,
+with a simulated per-round-trip latency) or a real MongoDB at MONGODB_URL,
+using a throwaway DATABASE_NAME (default ``ecommerce_bench``) that is dropped
+afterwards. Results are written as JSON and can be compared with a previous
+run.
+
+Usage:
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --compare results.json --output results-new.json
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.run --backend mongodb
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("DATABASE_NAME", "ecommerce_bench")
+
+from app import config
+from app.database import connection
+from app.database.migrations import rebuild_user_order_stats
+from app.schemas.schemas import ProductCreateSchema
+from app.services.product_service import _build_product_document
+from benchmarks.asgi_client import request
+from benchmarks.fake_mongo import use_fake_database
+
+_WORDS = ["classic", "slim", "cotton", "linen", "denim", "shirt", "jacket", "hoodie", "sneaker", "wool"]
+_SIZES = ["XS", "S", "M", "L", "XL"]
+
+RequestFactory = Callable[[random.Random], Tuple[str, str, str, bytes]]
+
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+async def seed(database, products: int, history_depths: List[int], rng: random.Random) -> List[Tuple[str, str]]:
+    """Insert the catalog and one user per history depth; returns (product ID, name) pairs"""
+    product_collection = database["products"]
+    catalog = []
+    documents = []
+    for i in range(products):
+        document = _build_product_document(ProductCreateSchema(
+            name=" ".join(rng.choice(_WORDS).title() for _ in range(2)) + f" {i}",
+            price=round(rng.uniform(5, 200), 2),
+            sizes=[{"size": size, "quantity": 1000} for size in rng.sample(_SIZES, 3)],
+        ))
+        documents.append(document)
+        if len(documents) >= 1000:
+            await product_collection.insert_many(documents, ordered=False)
+            catalog.extend((str(d["_id"]), d["name"]) for d in documents)
+            documents = []
+    if documents:
+        await product_collection.insert_many(documents, ordered=False)
+        catalog.extend((str(d["_id"]), d["name"]) for d in documents)
+
+    order_collection = database["orders"]
+    created_at = datetime.utcnow() - timedelta(days=365)
+    for depth in history_depths:
+        orders = []
+        for _ in range(depth):
+            product_id, name = rng.choice(catalog)
+            orders.append({
+                "userId": f"bench_user_{depth}",
+                "items": [{"productId": product_id, "qty": 1, "price": 10.0, "name": name}],
+                "totalAmount": 10.0,
+                "createdAt": created_at,
+                "status": "created",
+            })
+            if len(orders) >= 1000:
+                await order_collection.insert_many(orders, ordered=False)
+                orders = []
+        if orders:
+            await order_collection.insert_many(orders, ordered=False)
+    await rebuild_user_order_stats(database)
+
+    return catalog
+
+
+def build_scenarios(args, catalog: List[Tuple[str, str]]) -> Dict[str, RequestFactory]:
+    scenarios: Dict[str, RequestFactory] = {}
+
+    for cart_size in args.cart_sizes:
+        def create_order(rng, cart_size=cart_size):
+            items = [{"productId": rng.choice(catalog)[0], "qty": 1} for _ in range(cart_size)]
+            body = json.dumps({"userId": "bench_buyer", "items": items}).encode("utf-8")
+            return "POST", "/orders/", "", body
+        scenarios[f"create_order[cart={cart_size}]"] = create_order
+
+    filters = {
+        "none": lambda rng: "",
+        "name": lambda rng: f"name={rng.choice(_WORDS)}&",
+        "size": lambda rng: f"size={rng.choice(_SIZES)}&",
+    }
+    for filter_name, make_filter in filters.items():
+        for offset in args.offsets:
+            def get_products(rng, make_filter=make_filter, offset=offset):
+                return "GET", "/products/", f"{make_filter(rng)}limit=10&offset={offset}", b""
+            scenarios[f"get_products[filter={filter_name},offset={offset}]"] = get_products
+
+    for filter_name, make_filter in (("none", filters["none"]), ("name", filters["name"])):
+        def get_facets(rng, make_filter=make_filter):
+            return "GET", "/products/facets", make_filter(rng).rstrip("&"), b""
+        scenarios[f"get_product_facets[filter={filter_name}]"] = get_facets
+
+    for depth in args.history_depths:
+        for page, offset in (("first", 0), ("last", max(depth - 10, 0))):
+            def get_user_orders(rng, depth=depth, offset=offset):
+                return "GET", f"/orders/bench_user_{depth}", f"limit=10&offset={offset}", b""
+            scenarios[f"get_user_orders[depth={depth},page={page}]"] = get_user_orders
+
+        def get_user_summary(rng, depth=depth):
+            return "GET", f"/orders/bench_user_{depth}/summary", "", b""
+        scenarios[f"get_user_summary[depth={depth}]"] = get_user_summary
+
+    return scenarios
+
+
+async def run_scenario(app, make_request: RequestFactory, requests: int, concurrency: int, seed_value: int):
+    rng = random.Random(seed_value)
+    prepared = [make_request(rng) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < len(prepared):
+            method, path, query, body = prepared[next_index]
+            next_index += 1
+            headers = [("content-type", "application/json")] if body else []
+            start = time.perf_counter()
+            status, _, _ = await request(app, method, path, query, body, headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencies) / len(latencies),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+def disable_caches():
+    """Send every read to the backend so results reflect query cost, not cache hits"""
+    from app.routes import products as product_routes
+    from app.services import order_service, product_service
+
+    for cache in (
+        product_service._product_cache,
+        product_service._count_cache,
+        product_routes._response_cache,
+    ):
+        cache.max_entries = 0
+    config.COALESCE_PRODUCT_READS = False
+
+
+def print_results(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]]):
+    header = f"{'scenario':<44} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    if baseline:
+        header += f" {'Δp50':>8} {'Δp99':>8} {'Δrps':>8}"
+    print(header)
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:>+7.1f}%" if old else f"{'n/a':>8}"
+
+    for name, result in results.items():
+        line = (
+            f"{name:<44} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}"
+        )
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += (
+                f" {change(result['p50_ms'], previous['p50_ms'])}"
+                f" {change(result['p99_ms'], previous['p99_ms'])}"
+                f" {change(result['throughput_rps'], previous['throughput_rps'])}"
+            )
+        print(line)
+
+
+async def main(args) -> Dict[str, Any]:
+    if args.backend == "memory":
+        use_fake_database(args.round_trip_ms)
+
+    if args.disable_caches:
+        disable_caches()
+    config.ADMISSION_CONTROL = args.admission
+
+    from main import app
+
+    rng = random.Random(args.seed)
+    database = await connection.get_database()
+    try:
+        catalog = await seed(database, args.products, args.history_depths, rng)
+        scenarios = build_scenarios(args, catalog)
+
+        results = {}
+        for index, (name, make_request) in enumerate(scenarios.items()):
+            results[name] = await run_scenario(app, make_request, args.requests, args.concurrency, args.seed + index)
+    finally:
+        await database.client.drop_database(database.name)
+        await connection.close_mongo_connection()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "round_trip_ms": args.round_trip_ms if args.backend == "memory" else None,
+            "products": args.products,
+            "history_depths": args.history_depths,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "caches_disabled": args.disable_caches,
+            "admission_control": args.admission,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    int_list = lambda value: [int(item) for item in value.split(",") if item]
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("memory", "mongodb"), default="memory")
+    parser.add_argument("--round-trip-ms", type=float, default=1.0,
+                        help="Simulated latency per MongoDB round trip (memory backend)")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--history-depths", type=int_list, default=[10, 100, 1000])
+    parser.add_argument("--cart-sizes", type=int_list, default=[1, 5, 10, 30])
+    parser.add_argument("--offsets", type=int_list, default=[0, 1000])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--disable-caches", action="store_true",
+                        help="Turn off in-process caches and read coalescing")
+    parser.add_argument("--admission", action="store_true",
+                        help="Enable ADMISSION_CONTROL; shed requests (503) count as errors")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Show changes relative to a previous results file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(report["results"], baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
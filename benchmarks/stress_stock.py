@@ -0,0 +1,126 @@
+"""Concurrency stress check for stock reservation on order creation.
+
+Creates one "hot" product with a small stock and one "cold" product with
+plenty, then fires many concurrent POST /orders through the app in-process.
+Every order takes the cold product first and the hot product second, so the
+orders that lose the race on the hot size also exercise the compensation of
+their already reserved cold line. Afterwards it checks that:
+
+- every response is 201 or 409
+- exactly as many orders succeeded as the hot stock allowed, and no more
+- the hot quantity never went negative and equals stock minus what was sold
+- the cold quantity only lost what the successful orders bought
+- the orders collection holds exactly the successful orders
+
+and exits with status 1 if any check fails.
+
+Usage:
+    python -m benchmarks.stress_stock --orders 1000 --stock 100
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.stress_stock --backend mongodb
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("DATABASE_NAME", "ecommerce_bench")
+
+from app import config
+from app.database import connection
+from benchmarks.asgi_client import request
+from benchmarks.fake_mongo import use_fake_database
+
+_COLD_STOCK = 1_000_000
+
+
+async def create_product(app, name: str, quantity: int) -> str:
+    body = json.dumps({"name": name, "price": 10.0, "sizes": [{"size": "M", "quantity": quantity}]})
+    status, _, response = await request(app, "POST", "/products/", body=body.encode("utf-8"),
+                                        headers=[("content-type", "application/json")])
+    if status != 201:
+        raise RuntimeError(f"Creating {name} failed with {status}: {response!r}")
+    return json.loads(response)["id"]
+
+
+async def stock_of(database, product_id: str) -> int:
+    from bson import ObjectId
+
+    product = await database["products"].find_one({"_id": ObjectId(product_id)})
+    return next(entry["quantity"] for entry in product["sizes"] if entry["size"] == "M")
+
+
+async def main(args) -> bool:
+    if args.backend == "memory":
+        use_fake_database(args.round_trip_ms)
+    config.ORDER_WRITE_BATCHING = args.batching
+
+    from main import app
+
+    database = await connection.get_database()
+    try:
+        hot_id = await create_product(app, "Hot Sneaker", args.stock)
+        cold_id = await create_product(app, "Cold Sock", _COLD_STOCK)
+
+        body = json.dumps({
+            "userId": "stress_buyer",
+            "items": [
+                {"productId": cold_id, "qty": args.qty, "size": "M"},
+                {"productId": hot_id, "qty": args.qty, "size": "M"},
+            ],
+        }).encode("utf-8")
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def place_order():
+            async with semaphore:
+                status, _, _ = await request(app, "POST", "/orders/", body=body,
+                                             headers=[("content-type", "application/json")])
+                return status
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(place_order() for _ in range(args.orders)))
+        elapsed = time.perf_counter() - start
+
+        succeeded = statuses.count(201)
+        rejected = statuses.count(409)
+        expected = min(args.orders, args.stock // args.qty)
+        hot_left = await stock_of(database, hot_id)
+        cold_left = await stock_of(database, cold_id)
+        orders_written = await database["orders"].count_documents({"userId": "stress_buyer"})
+
+        checks = [
+            ("only 201 and 409 responses", succeeded + rejected == args.orders),
+            ("successful orders match available stock", succeeded == expected),
+            ("hot stock is not negative", hot_left >= 0),
+            ("hot stock accounts for every sale", hot_left == args.stock - succeeded * args.qty),
+            ("failed orders returned the cold stock", cold_left == _COLD_STOCK - succeeded * args.qty),
+            ("one order document per success", orders_written == succeeded),
+        ]
+
+        print(f"{args.orders} orders in {elapsed:.2f}s ({args.orders / elapsed:.0f}/s), "
+              f"concurrency {args.concurrency}: {succeeded} created, {rejected} rejected, "
+              f"{args.orders - succeeded - rejected} other")
+        print(f"hot stock {args.stock} -> {hot_left}, cold stock {_COLD_STOCK} -> {cold_left}, "
+              f"{orders_written} orders written")
+        for label, passed in checks:
+            print(f"  [{'ok' if passed else 'FAIL'}] {label}")
+        return all(passed for _, passed in checks)
+    finally:
+        await database.client.drop_database(database.name)
+        await connection.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("memory", "mongodb"), default="memory")
+    parser.add_argument("--round-trip-ms", type=float, default=1.0,
+                        help="Simulated latency per MongoDB round trip (memory backend)")
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--stock", type=int, default=100, help="Starting quantity of the hot size")
+    parser.add_argument("--qty", type=int, default=1, help="Quantity of each line in every order")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--batching", action="store_true", help="Enable ORDER_WRITE_BATCHING")
+    args = parser.parse_args()
+
+    sys.exit(0 if asyncio.run(main(args)) else 1)
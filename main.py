@@ -1,14 +1,36 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.database.connection import connect_to_mongo, close_mongo_connection
+from app.database.connection import (
+    connect_to_mongo,
+    close_mongo_connection,
+    get_database,
+    get_pool_stats,
+    warm_up_connection
+)
 from app.routes.products import router as products_router
 from app.routes.orders import router as orders_router
+from app.services.order_service import OrderService
+from app import config, metrics
+from app.admission import AdmissionControlMiddleware, get_admission_stats
+from app.logging_config import configure_logging
 import os
 
+# At import rather than in the lifespan, which serverless runtimes may skip
+configure_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup - but keep it minimal for serverless
+    if config.MONGODB_CONNECTION_MODE == "server":
+        await connect_to_mongo()
+    else:
+        # Not awaited: requests are served while the connection is set up
+        warm_up_connection()
+    if config.ENSURE_INDEXES_ON_STARTUP:
+        from app.database.indexes import ensure_indexes
+        await ensure_indexes(await get_database())
     yield
     # Shutdown
     await close_mongo_connection()
@@ -20,6 +42,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Added before CORS so that shed requests still get CORS headers
+app.add_middleware(AdmissionControlMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,6 +53,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(products_router, prefix="/products", tags=["products"])
 app.include_router(orders_router, prefix="/orders", tags=["orders"])
@@ -38,7 +65,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "environment": "production"}
+    return {
+        "status": "healthy",
+        "environment": "production",
+        "database_pool": get_pool_stats(),
+        "order_write_batcher": OrderService.get_write_batcher_stats(),
+        "admission": get_admission_stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,23 @@
+import pytest
+
+from app.database import connection
+from app.routes import products as product_routes
+from app.services import product_service
+from app.services.singleflight import SingleFlight
+from benchmarks.fake_mongo import FakeDatabase
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """A fresh in-memory FakeDatabase behind get_database, with empty module caches"""
+    fake_database = FakeDatabase()
+
+    async def get_database():
+        return fake_database
+
+    monkeypatch.setattr(connection, "get_database", get_database)
+    product_service._product_cache.clear()
+    product_service._count_cache.clear()
+    product_routes._response_cache.clear()
+    monkeypatch.setattr(product_service, "_single_flight", SingleFlight())
+    return fake_database
@@ -0,0 +1,46 @@
+"""ConcurrencyLimiter slot accounting."""
+import asyncio
+
+from app.admission import QUEUE_FULL, QUEUE_TIMEOUT, ConcurrencyLimiter
+
+
+def test_timed_out_waiter_that_was_handed_a_slot_returns_it(monkeypatch):
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, max_wait_seconds=1.0)
+        assert await limiter.acquire() is None
+
+        async def wait_for(waiter, timeout):
+            # What wait_for can do on Python 3.12+: the slot is handed over,
+            # and the timeout still wins
+            await asyncio.sleep(0)
+            limiter.release()
+            await asyncio.sleep(0)
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(asyncio, "wait_for", wait_for)
+        assert await limiter.acquire() == QUEUE_TIMEOUT
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+
+def test_full_queue_is_rejected_and_released_slots_are_reused():
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, max_wait_seconds=1.0)
+        assert await limiter.acquire() is None
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert await limiter.acquire() == QUEUE_FULL
+
+        limiter.release()
+        assert await waiting is None
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["in_flight"] == 0
+    assert stats["rejected_queue_full"] == 1
@@ -0,0 +1,59 @@
+"""Read coalescing for order pricing lookups."""
+import asyncio
+
+import pytest
+
+from app import config
+from app.schemas.schemas import ProductCreateSchema
+from app.services import product_service
+from app.services.product_service import ProductService
+
+
+def _uncached_products(count: int) -> list:
+    async def create():
+        product = ProductCreateSchema(name="Sneaker", price=50.0, sizes=[{"size": "M", "quantity": 10}])
+        return [(await ProductService.create_product(product))["id"] for _ in range(count)]
+
+    product_ids = asyncio.run(create())
+    product_service._product_cache.clear()
+    return product_ids
+
+
+@pytest.mark.parametrize("coalesce, expected_queries", [(True, 1), (False, 200)])
+def test_concurrent_lookups_of_one_product(database, monkeypatch, coalesce, expected_queries):
+    monkeypatch.setattr(config, "COALESCE_PRODUCT_READS", coalesce)
+    product_id, = _uncached_products(1)
+
+    async def lookups():
+        return await asyncio.gather(*(ProductService.get_products_by_ids([product_id]) for _ in range(200)))
+
+    before = database.round_trips
+    results = asyncio.run(lookups())
+
+    assert database.round_trips - before == expected_queries
+    assert all(result[product_id]["name"] == "Sneaker" for result in results)
+
+
+@pytest.mark.parametrize("coalesce", [True, False])
+def test_uncached_cart_is_one_query(database, monkeypatch, coalesce):
+    monkeypatch.setattr(config, "COALESCE_PRODUCT_READS", coalesce)
+    product_ids = _uncached_products(30)
+    unknown_id = "0" * 24
+
+    before = database.round_trips
+    products = asyncio.run(ProductService.get_products_by_ids(product_ids + [unknown_id, "not-an-id"]))
+
+    assert database.round_trips - before == 1
+    assert sorted(products) == sorted(product_ids)
+
+
+def test_get_product_by_id_uses_the_cache(database):
+    product_id, = _uncached_products(1)
+
+    before = database.round_trips
+    first = asyncio.run(ProductService.get_product_by_id(product_id))
+    second = asyncio.run(ProductService.get_product_by_id(product_id))
+
+    assert database.round_trips - before == 1
+    assert first == second and first["name"] == "Sneaker"
+    assert asyncio.run(ProductService.get_product_by_id("not-an-id")) is None
@@ -0,0 +1,36 @@
+"""Stock reservation and its compensation when a line cannot be reserved."""
+import asyncio
+
+import bson
+import pytest
+
+from app.schemas.schemas import ProductCreateSchema
+from app.services.product_service import ProductService
+
+
+def _quantities(database, product_id: str) -> dict:
+    product = asyncio.run(database["products"].find_one({"_id": bson.ObjectId(product_id)}))
+    return {entry["size"]: entry["quantity"] for entry in product["sizes"]}
+
+
+def test_failed_line_puts_reserved_lines_back(database):
+    product = ProductCreateSchema(
+        name="Sneaker", price=50.0, sizes=[{"size": "M", "quantity": 5}, {"size": "L", "quantity": 1}]
+    )
+    product_id = asyncio.run(ProductService.create_product(product))["id"]
+
+    with pytest.raises(ValueError, match=r"size L"):
+        asyncio.run(ProductService.reserve_stock([(product_id, "M", 3), (product_id, "L", 2)]))
+
+    assert _quantities(database, product_id) == {"M": 5, "L": 1}
+
+
+def test_reservation_takes_every_line(database):
+    product = ProductCreateSchema(
+        name="Sneaker", price=50.0, sizes=[{"size": "M", "quantity": 5}, {"size": "L", "quantity": 1}]
+    )
+    product_id = asyncio.run(ProductService.create_product(product))["id"]
+
+    asyncio.run(ProductService.reserve_stock([(product_id, "M", 3), (product_id, "L", 1)]))
+
+    assert _quantities(database, product_id) == {"M": 2, "L": 0}
@@ -0,0 +1,26 @@
+"""Per-user order stats for users with orders from before the stats existed."""
+import asyncio
+from datetime import datetime
+
+from app.schemas.schemas import OrderCreateSchema, ProductCreateSchema
+from app.services.order_service import OrderService
+from app.services.product_service import ProductService
+
+
+def test_first_order_counts_earlier_orders(database):
+    asyncio.run(database["orders"].insert_many([
+        {"userId": "user_1", "items": [], "totalAmount": 10.0, "createdAt": datetime(2024, 1, day), "status": "created"}
+        for day in range(1, 6)
+    ]))
+    product = ProductCreateSchema(name="Sneaker", price=50.0, sizes=[{"size": "M", "quantity": 10}])
+    product_id = asyncio.run(ProductService.create_product(product))["id"]
+    order = OrderCreateSchema(userId="user_1", items=[{"productId": product_id, "qty": 1}])
+
+    created = asyncio.run(OrderService.create_order(order))
+    summary = asyncio.run(OrderService.get_user_summary("user_1"))
+    page = asyncio.run(OrderService.get_user_orders("user_1", include_total=True))["page"]
+
+    assert summary["orderCount"] == 6
+    assert summary["totalSpend"] == 100.0
+    assert summary["lastOrderAt"] == created["createdAt"]
+    assert page["total"] == 6
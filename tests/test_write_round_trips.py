@@ -0,0 +1,61 @@
+"""Database commands issued per create.
+
+Creates build their responses from the written document instead of reading
+it back, so creating a product is a single insert. These tests pin the
+number of commands each create issues, so adding one is a deliberate change.
+"""
+import asyncio
+
+from app.schemas.schemas import OrderCreateSchema, ProductCreateSchema
+from app.services.order_service import OrderService
+from app.services.product_service import ProductService
+
+
+def _create_product():
+    product = ProductCreateSchema(name="Sneaker", price=50.0, sizes=[{"size": "M", "quantity": 10}])
+    return asyncio.run(ProductService.create_product(product))
+
+
+def test_create_product_is_one_insert(database):
+    before = database.round_trips
+    product = _create_product()
+
+    assert database.round_trips - before == 1
+    assert product["name"] == "Sneaker" and "_id" not in product
+
+
+def test_create_order_without_sizes(database):
+    product_id = _create_product()["id"]
+    order = OrderCreateSchema(userId="user_1", items=[{"productId": product_id, "qty": 2}])
+
+    before = database.round_trips
+    created = asyncio.run(OrderService.create_order(order))
+
+    # The product is priced from the cache; then the insert, the stats
+    # update, and for a user's first order the aggregation seeding the
+    # stats with their earlier orders
+    assert database.round_trips - before == 3
+    assert created["totalAmount"] == 100.0
+
+    before = database.round_trips
+    asyncio.run(OrderService.create_order(order))
+
+    assert database.round_trips - before == 2
+
+
+def test_create_order_with_sizes(database):
+    product = ProductCreateSchema(
+        name="Sneaker", price=50.0, sizes=[{"size": "M", "quantity": 10}, {"size": "L", "quantity": 10}]
+    )
+    product_id = asyncio.run(ProductService.create_product(product))["id"]
+    order = OrderCreateSchema(userId="user_1", items=[
+        {"productId": product_id, "qty": 2, "size": "M"},
+        {"productId": product_id, "qty": 1, "size": "L"},
+    ])
+    asyncio.run(OrderService.create_order(OrderCreateSchema(userId="user_1", items=[{"productId": product_id, "qty": 1}])))
+
+    before = database.round_trips
+    asyncio.run(OrderService.create_order(order))
+
+    # One conditional update per sized line, then the insert and the stats update
+    assert database.round_trips - before == 4